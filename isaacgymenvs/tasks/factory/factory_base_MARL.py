@@ -34,20 +34,26 @@ Configuration defined in FactoryBase_MARL.yaml. Asset info defined in factory_as
 """
 
 
+import copy
 import hydra
 import math
-import numpy as np
+import numpy as np  # only used by extract_poses (scene export)
 import os
 import sys
 import torch
+from types import SimpleNamespace
 
 from gym import logger
 from isaacgym import gymapi, gymtorch, torch_utils
+from omegaconf import OmegaConf
 from isaacgymenvs.tasks.base.vec_task import VecTask
 import isaacgymenvs.tasks.factory.factory_control as fc
 from isaacgymenvs.tasks.factory.factory_schema_class_base import FactoryABCBase
 from isaacgymenvs.tasks.factory.factory_schema_config_base import FactorySchemaConfigBase
 
+# Composed base configs, keyed by (config_path, asset_info_path); shared across instances
+_yaml_cache = {}
+
 
 class FactoryBase_MARL(VecTask, FactoryABCBase):
 
@@ -67,16 +73,26 @@ class FactoryBase_MARL(VecTask, FactoryABCBase):
     def _get_base_yaml_params(self):
         """Initialize instance variables from YAML files."""
 
-        cs = hydra.core.config_store.ConfigStore.instance()
-        cs.store(name='factory_schema_config_base', node=FactorySchemaConfigBase)
-
         config_path = 'task/FactoryBase_MARL.yaml'  # relative to Gym's Hydra search path (cfg dir)
-        self.cfg_base = hydra.compose(config_name=config_path)
-        self.cfg_base = self.cfg_base['task']  # strip superfluous nesting
-
         asset_info_path = '../../assets/factory/yaml/factory_asset_info_franka_table.yaml'  # relative to Gym's Hydra search path (cfg dir)
-        self.asset_info_franka_table = hydra.compose(config_name=asset_info_path)
-        self.asset_info_franka_table = self.asset_info_franka_table['']['']['']['']['']['']['assets']['factory']['yaml']  # strip superfluous nesting
+
+        key = (config_path, asset_info_path)
+        if key not in _yaml_cache:
+            cs = hydra.core.config_store.ConfigStore.instance()
+            cs.store(name='factory_schema_config_base', node=FactorySchemaConfigBase)
+
+            cfg_base = hydra.compose(config_name=config_path)
+            cfg_base = cfg_base['task']  # strip superfluous nesting
+
+            asset_info_franka_table = hydra.compose(config_name=asset_info_path)
+            asset_info_franka_table = asset_info_franka_table['']['']['']['']['']['']['assets']['factory']['yaml']  # strip superfluous nesting
+            # Asset info is flat and read-only; resolve once into plain attributes instead of DictConfig lookups
+            asset_info_franka_table = SimpleNamespace(**OmegaConf.to_container(asset_info_franka_table, resolve=True))
+
+            _yaml_cache[key] = (cfg_base, asset_info_franka_table)
+
+        # Deep copy so that per-instance modifications do not leak into the cache
+        self.cfg_base, self.asset_info_franka_table = copy.deepcopy(_yaml_cache[key])
 
 
     def create_sim(self):
@@ -200,14 +216,17 @@ class FactoryBase_MARL(VecTask, FactoryABCBase):
         self.mass_matrix = gymtorch.wrap_tensor(_mass_matrix)
 
         # Wrap_Tensor for Franka_2
+        # Kept as separate device tensors; do not concatenate with Franka_1 tensors on host
         self.jacobian_2 = gymtorch.wrap_tensor(_jacobian_2)
         self.mass_matrix_2 = gymtorch.wrap_tensor(_mass_matrix_2)
 
-        print("root state: ", self.root_state.size()) # torch.Size([640, 13]), 
-        #  128 more than single agent, because x2 actor_count
+        verbose_shapes = self.cfg_base.mode.get('verbose_shapes', False)
+        if verbose_shapes:
+            logger.debug("root state: %s", tuple(self.root_state.shape)) # torch.Size([640, 13]), 
+            #  128 more than single agent, because x2 actor_count
 
-        # x2 degree of freedom (single agent: 9, double agent: 18)
-        print("dof state: ", self.dof_state.size())  # torch.Size([2304, 2])
+            # x2 degree of freedom (single agent: 9, double agent: 18)
+            logger.debug("dof state: %s", tuple(self.dof_state.shape))  # torch.Size([2304, 2])
 
         """
         List of default tensor sizes for two panda robots:
@@ -237,112 +256,146 @@ class FactoryBase_MARL(VecTask, FactoryABCBase):
         # I don't think anything should be changed here
         # duplicate the whole thing, but index 
         # (self.num_envs, self.num_actors, 13), should be 26.
-        self.root_pos = self.root_state.view(self.num_envs, self.num_actors, 13)[..., 0:3]
-        self.root_quat = self.root_state.view(self.num_envs, self.num_actors, 13)[..., 3:7]
-        self.root_linvel = self.root_state.view(self.num_envs, self.num_actors, 13)[..., 7:10]
-        self.root_angvel = self.root_state.view(self.num_envs, self.num_actors, 13)[..., 10:13]
-        self.body_pos = self.body_state.view(self.num_envs, self.num_bodies, 13)[..., 0:3]
-        self.body_quat = self.body_state.view(self.num_envs, self.num_bodies, 13)[..., 3:7]
-        self.body_linvel = self.body_state.view(self.num_envs, self.num_bodies, 13)[..., 7:10]
-        self.body_angvel = self.body_state.view(self.num_envs, self.num_bodies, 13)[..., 10:13]
-        self.dof_pos = self.dof_state.view(self.num_envs, self.num_dofs, 2)[..., 0]
-        self.dof_vel = self.dof_state.view(self.num_envs, self.num_dofs, 2)[..., 1]
+        root_state_view = self.root_state.view(self.num_envs, self.num_actors, 13)
+        self.body_state_view = self.body_state.view(self.num_envs, self.num_bodies, 13)
+        dof_state_view = self.dof_state.view(self.num_envs, self.num_dofs, 2)
+
+        self.root_pos = root_state_view[..., 0:3]
+        self.root_quat = root_state_view[..., 3:7]
+        self.root_linvel = root_state_view[..., 7:10]
+        self.root_angvel = root_state_view[..., 10:13]
+        self.body_pos = self.body_state_view[..., 0:3]
+        self.body_quat = self.body_state_view[..., 3:7]
+        self.body_linvel = self.body_state_view[..., 7:10]
+        self.body_angvel = self.body_state_view[..., 10:13]
+        self.dof_pos = dof_state_view[..., 0]
+        self.dof_vel = dof_state_view[..., 1]
         self.dof_force_view = self.dof_force.view(self.num_envs, self.num_dofs, 1)[..., 0]
         self.contact_force = self.contact_force.view(self.num_envs, self.num_bodies, 3)[..., 0:3]
 
-        self.arm_dof_pos = self.dof_pos[:, 0:7]
+        # DOFs are ordered per actor, and franka / franka_2 are created back to back in each env,
+        # so DOFs 0-8 belong to Franka 1 and DOFs 9-17 to Franka 2 (7 arm + 2 gripper each)
+        self.franka_dof_pos = self.dof_state.view(self.num_envs, 2, 9, 2)[..., 0]  # (num_envs, 2, 9)
+        self.arm_dof_pos = self.franka_dof_pos[:, 0, 0:7]
+        self.arm_dof_pos_2 = self.franka_dof_pos[:, 1, 0:7]
 
         # Franka_1 arm mass matrix
         self.arm_mass_matrix = self.mass_matrix[:, 0:7, 0:7]  # for Franka arm (not gripper)
         # Franka_2 arm mass matrix
         self.arm_mass_matrix_2 = self.mass_matrix_2[:, 0:7, 0:7]  # for Franka_2 arm (not gripper)
 
+        # Gather all Franka bodies read by the base class into one contiguous block (re-gathered in
+        # refresh_base_tensors), in the order hand, left finger, right finger, fingertip centered of Franka 1, then
+        # the same bodies of Franka 2
+        self._body_indices = torch.tensor([self.hand_body_id_env, self.left_finger_body_id_env,
+                                           self.right_finger_body_id_env, self.fingertip_centered_body_id_env,
+                                           self.hand_body_id_env_2, self.left_finger_body_id_env_2,
+                                           self.right_finger_body_id_env_2, self.fingertip_centered_body_id_env_2],
+                                          dtype=torch.long, device=self.device)
+        self._finger_body_indices = self._body_indices.view(2, 4)[:, 1:3].reshape(-1)  # left, right (Franka 1, 2)
+        self._selected_body_state = self.body_state_view.index_select(1, self._body_indices)  # (num_envs, 8, 13)
+        self._selected_contact_force = self.contact_force.index_select(1, self._finger_body_indices)  # (num_envs, 4, 3)
+        # Both Frankas as one batch of 2 * num_envs rows (env 0 Franka 1, env 0 Franka 2, env 1 Franka 1, ...);
+        # a view of the gathered block, so batched calls need no concatenation
+        self._selected_body_state_2b = self._selected_body_state.view(2 * self.num_envs, 4, 13)
+
         # Franka 1 Properties
-        self.hand_pos = self.body_pos[:, self.hand_body_id_env, 0:3]
-        self.hand_quat = self.body_quat[:, self.hand_body_id_env, 0:4]
-        self.hand_linvel = self.body_linvel[:, self.hand_body_id_env, 0:3]
-        self.hand_angvel = self.body_angvel[:, self.hand_body_id_env, 0:3]
+        self.hand_pos = self._selected_body_state[:, 0, 0:3]
+        self.hand_quat = self._selected_body_state[:, 0, 3:7]
+        self.hand_linvel = self._selected_body_state[:, 0, 7:10]
+        self.hand_angvel = self._selected_body_state[:, 0, 10:13]
 
         # Franka 2 Properties
-        self.hand_pos_2 = self.body_pos[:, self.hand_body_id_env_2, 0:3]
-        self.hand_quat_2 = self.body_quat[:, self.hand_body_id_env_2, 0:4]
-        self.hand_linvel_2 = self.body_linvel[:, self.hand_body_id_env_2, 0:3]
-        self.hand_angvel_2 = self.body_angvel[:, self.hand_body_id_env_2, 0:3]
+        self.hand_pos_2 = self._selected_body_state[:, 4, 0:3]
+        self.hand_quat_2 = self._selected_body_state[:, 4, 3:7]
+        self.hand_linvel_2 = self._selected_body_state[:, 4, 7:10]
+        self.hand_angvel_2 = self._selected_body_state[:, 4, 10:13]
         
         # Franka_1 Hand Jacobian
         self.hand_jacobian = self.jacobian[:, self.hand_body_id_env - 1, 0:6, 0:7]  # minus 1 because base is fixed
         # Franka_2 Hand Jacobian
-        print("hand_body_id_env_2: ", self.hand_body_id_env_2)
-        print("hand_body_id_env: ", self.hand_body_id_env)
+        # Sliced directly from jacobian_2 (its own actor tensor); no duplicated Jacobian block is built
+        if verbose_shapes:
+            logger.debug("hand_body_id_env_2: %s", self.hand_body_id_env_2)
+            logger.debug("hand_body_id_env: %s", self.hand_body_id_env)
         # -11 because environment default
         self.hand_jacobian_2 = self.jacobian_2[:, self.hand_body_id_env_2 - 1 -11, 0:6, 0:7]  # minus 1 because base is fixed
 
         # Franka 1
-        self.left_finger_pos = self.body_pos[:, self.left_finger_body_id_env, 0:3]
-        self.left_finger_quat = self.body_quat[:, self.left_finger_body_id_env, 0:4]
-        self.left_finger_linvel = self.body_linvel[:, self.left_finger_body_id_env, 0:3]
-        self.left_finger_angvel = self.body_angvel[:, self.left_finger_body_id_env, 0:3]
+        self.left_finger_pos = self._selected_body_state[:, 1, 0:3]
+        self.left_finger_quat = self._selected_body_state[:, 1, 3:7]
+        self.left_finger_linvel = self._selected_body_state[:, 1, 7:10]
+        self.left_finger_angvel = self._selected_body_state[:, 1, 10:13]
         self.left_finger_jacobian = self.jacobian[:, self.left_finger_body_id_env - 1, 0:6, 0:7]  # minus 1 because base is fixed
 
         # Franka 2
-        self.left_finger_pos_2 = self.body_pos[:, self.left_finger_body_id_env_2, 0:3]
-        self.left_finger_quat_2 = self.body_quat[:, self.left_finger_body_id_env_2, 0:4]
-        self.left_finger_linvel_2 = self.body_linvel[:, self.left_finger_body_id_env_2, 0:3]
-        self.left_finger_angvel_2 = self.body_angvel[:, self.left_finger_body_id_env_2, 0:3]
+        self.left_finger_pos_2 = self._selected_body_state[:, 5, 0:3]
+        self.left_finger_quat_2 = self._selected_body_state[:, 5, 3:7]
+        self.left_finger_linvel_2 = self._selected_body_state[:, 5, 7:10]
+        self.left_finger_angvel_2 = self._selected_body_state[:, 5, 10:13]
         # -11 because environment default
         self.left_finger_jacobian_2 = self.jacobian_2[:, self.left_finger_body_id_env_2 - 1 -11, 0:6, 0:7]
         
         # Franka 1
-        self.right_finger_pos = self.body_pos[:, self.right_finger_body_id_env, 0:3]
-        self.right_finger_quat = self.body_quat[:, self.right_finger_body_id_env, 0:4]
-        self.right_finger_linvel = self.body_linvel[:, self.right_finger_body_id_env, 0:3]
-        self.right_finger_angvel = self.body_angvel[:, self.right_finger_body_id_env, 0:3]
+        self.right_finger_pos = self._selected_body_state[:, 2, 0:3]
+        self.right_finger_quat = self._selected_body_state[:, 2, 3:7]
+        self.right_finger_linvel = self._selected_body_state[:, 2, 7:10]
+        self.right_finger_angvel = self._selected_body_state[:, 2, 10:13]
         self.right_finger_jacobian = self.jacobian[:, self.right_finger_body_id_env - 1, 0:6, 0:7]  # minus 1 because base is fixed
 
         # Franka 2
-        self.right_finger_pos_2 = self.body_pos[:, self.right_finger_body_id_env_2, 0:3]
-        self.right_finger_quat_2 = self.body_quat[:, self.right_finger_body_id_env_2, 0:4]
-        self.right_finger_linvel_2 = self.body_linvel[:, self.right_finger_body_id_env_2, 0:3]
-        self.right_finger_angvel_2 = self.body_angvel[:, self.right_finger_body_id_env_2, 0:3]
+        self.right_finger_pos_2 = self._selected_body_state[:, 6, 0:3]
+        self.right_finger_quat_2 = self._selected_body_state[:, 6, 3:7]
+        self.right_finger_linvel_2 = self._selected_body_state[:, 6, 7:10]
+        self.right_finger_angvel_2 = self._selected_body_state[:, 6, 10:13]
         # -11 because environment default
         self.right_finger_jacobian_2 = self.jacobian_2[:, self.right_finger_body_id_env_2 - 1 -11, 0:6, 0:7]
 
         # Franka 1
-        self.left_finger_force = self.contact_force[:, self.left_finger_body_id_env, 0:3]
-        self.right_finger_force = self.contact_force[:, self.right_finger_body_id_env, 0:3]
+        self.left_finger_force = self._selected_contact_force[:, 0, 0:3]
+        self.right_finger_force = self._selected_contact_force[:, 1, 0:3]
 
         # Franka 2
-        self.left_finger_force_2 = self.contact_force[:, self.left_finger_body_id_env_2, 0:3]
-        self.right_finger_force_2 = self.contact_force[:, self.right_finger_body_id_env_2, 0:3]
+        self.left_finger_force_2 = self._selected_contact_force[:, 2, 0:3]
+        self.right_finger_force_2 = self._selected_contact_force[:, 3, 0:3]
 
 
-        self.gripper_dof_pos = self.dof_pos[:, 7:9]
+        self.gripper_dof_pos = self.franka_dof_pos[:, 0, 7:9]
+        self.gripper_dof_pos_2 = self.franka_dof_pos[:, 1, 7:9]
 
         # Franka 1
-        self.fingertip_centered_pos = self.body_pos[:, self.fingertip_centered_body_id_env, 0:3]
-        self.fingertip_centered_quat = self.body_quat[:, self.fingertip_centered_body_id_env, 0:4]
-        self.fingertip_centered_linvel = self.body_linvel[:, self.fingertip_centered_body_id_env, 0:3]
-        self.fingertip_centered_angvel = self.body_angvel[:, self.fingertip_centered_body_id_env, 0:3]
+        self.fingertip_centered_pos = self._selected_body_state[:, 3, 0:3]
+        self.fingertip_centered_quat = self._selected_body_state[:, 3, 3:7]
+        self.fingertip_centered_linvel = self._selected_body_state[:, 3, 7:10]
+        self.fingertip_centered_angvel = self._selected_body_state[:, 3, 10:13]
         self.fingertip_centered_jacobian = self.jacobian[:, self.fingertip_centered_body_id_env - 1, 0:6, 0:7]  # minus 1 because base is fixed
 
         # Franka 2
-        self.fingertip_centered_pos_2 = self.body_pos[:, self.fingertip_centered_body_id_env_2, 0:3]
-        self.fingertip_centered_quat_2 = self.body_quat[:, self.fingertip_centered_body_id_env_2, 0:4]
-        self.fingertip_centered_linvel_2 = self.body_linvel[:, self.fingertip_centered_body_id_env_2, 0:3]
-        self.fingertip_centered_angvel_2 = self.body_angvel[:, self.fingertip_centered_body_id_env_2, 0:3]
+        self.fingertip_centered_pos_2 = self._selected_body_state[:, 7, 0:3]
+        self.fingertip_centered_quat_2 = self._selected_body_state[:, 7, 3:7]
+        self.fingertip_centered_linvel_2 = self._selected_body_state[:, 7, 7:10]
+        self.fingertip_centered_angvel_2 = self._selected_body_state[:, 7, 10:13]
         # -11 because environment default
         self.fingertip_centered_jacobian_2 = self.jacobian_2[:, self.fingertip_centered_body_id_env_2 - 1 -12, 0:6, 0:7]
 
-        self.fingertip_midpoint_pos = self.fingertip_centered_pos.detach().clone()  # initial value
+        self.fingertip_midpoint_pos = torch.empty_like(self.fingertip_centered_pos)  # set in refresh_base_tensors
         self.fingertip_midpoint_quat = self.fingertip_centered_quat  # always equal
-        self.fingertip_midpoint_linvel = self.fingertip_centered_linvel.detach().clone()  # initial value
+        # Finger length along local Z for both Frankas, wrapped once instead of every refresh
+        self._finger_offset = torch.zeros((2 * self.num_envs, 3), device=self.device)
+        self._finger_offset[:, 2] = self.asset_info_franka_table.franka_finger_length
+        self._offset_buf = torch.empty((2 * self.num_envs, 3), device=self.device)  # midpoint minus centered pos
+        # Both Frankas' fingertip midpoint linvel live in one scratch buffer that refresh_base_tensors writes in place
+        self._fingertip_midpoint_linvel_buf = torch.empty((2 * self.num_envs, 3), device=self.device)
+        self.fingertip_midpoint_linvel, self.fingertip_midpoint_linvel_2 = \
+            self._fingertip_midpoint_linvel_buf.view(self.num_envs, 2, 3).unbind(1)  # set in refresh_base_tensors
         # From sum of angular velocities (https://physics.stackexchange.com/questions/547698/understanding-addition-of-angular-velocity),
         # angular velocity of midpoint w.r.t. world is equal to sum of
         # angular velocity of midpoint w.r.t. hand and angular velocity of hand w.r.t. world. 
         # Midpoint is in sliding contact (i.e., linear relative motion) with hand; angular velocity of midpoint w.r.t. hand is zero.
         # Thus, angular velocity of midpoint w.r.t. world is equal to angular velocity of hand w.r.t. world.
         self.fingertip_midpoint_angvel = self.fingertip_centered_angvel  # always equal
-        self.fingertip_midpoint_jacobian = (self.left_finger_jacobian + self.right_finger_jacobian) * 0.5  # approximation
+        self._mid_jac_buf = torch.lerp(self.left_finger_jacobian, self.right_finger_jacobian, 0.5)  # approximation
+        self.fingertip_midpoint_jacobian = self._mid_jac_buf
 
         self.dof_torque = torch.zeros((self.num_envs, self.num_dofs), device=self.device)
         self.fingertip_contact_wrench = torch.zeros((self.num_envs, 6), device=self.device)
@@ -353,22 +406,27 @@ class FactoryBase_MARL(VecTask, FactoryABCBase):
         self.ctrl_target_gripper_dof_pos = torch.zeros((self.num_envs, 2), device=self.device)
         self.ctrl_target_fingertip_contact_wrench = torch.zeros((self.num_envs, 6), device=self.device)
 
+        self.ctrl_target_fingertip_midpoint_pos_2 = torch.zeros((self.num_envs, 3), device=self.device)
+        self.ctrl_target_fingertip_midpoint_quat_2 = torch.zeros((self.num_envs, 4), device=self.device)
+        self.ctrl_target_gripper_dof_pos_2 = torch.zeros((self.num_envs, 2), device=self.device)
+        self.ctrl_target_fingertip_contact_wrench_2 = torch.zeros((self.num_envs, 6), device=self.device)
+
         self.prev_actions = torch.zeros((self.num_envs, self.num_actions), device=self.device)
 
 
 
 
         # Franka_2
-        self.fingertip_midpoint_pos_2 = self.fingertip_centered_pos_2.detach().clone()  # initial value
+        self.fingertip_midpoint_pos_2 = torch.empty_like(self.fingertip_centered_pos_2)  # set in refresh_base_tensors
         self.fingertip_midpoint_quat_2 = self.fingertip_centered_quat_2  # always equal
-        self.fingertip_midpoint_linvel_2 = self.fingertip_centered_linvel_2.detach().clone()  # initial value
         # From sum of angular velocities (https://physics.stackexchange.com/questions/547698/understanding-addition-of-angular-velocity),
         # angular velocity of midpoint w.r.t. world is equal to sum of
         # angular velocity of midpoint w.r.t. hand and angular velocity of hand w.r.t. world. 
         # Midpoint is in sliding contact (i.e., linear relative motion) with hand; angular velocity of midpoint w.r.t. hand is zero.
         # Thus, angular velocity of midpoint w.r.t. world is equal to angular velocity of hand w.r.t. world.
         self.fingertip_midpoint_angvel_2 = self.fingertip_centered_angvel_2  # always equal
-        self.fingertip_midpoint_jacobian_2 = (self.left_finger_jacobian_2 + self.right_finger_jacobian_2) * 0.5  # approximation
+        self._mid_jac_buf_2 = torch.lerp(self.left_finger_jacobian_2, self.right_finger_jacobian_2, 0.5)  # approximation
+        self.fingertip_midpoint_jacobian_2 = self._mid_jac_buf_2
 
         # self.dof_torque = torch.zeros((self.num_envs, self.num_dofs), device=self.device)
         # self.fingertip_contact_wrench = torch.zeros((self.num_envs, 6), device=self.device)
@@ -393,28 +451,30 @@ class FactoryBase_MARL(VecTask, FactoryABCBase):
         self.gym.refresh_jacobian_tensors(self.sim)
         self.gym.refresh_mass_matrix_tensors(self.sim)
 
-        self.finger_midpoint_pos = (self.left_finger_pos + self.right_finger_pos) * 0.5
-        self.fingertip_midpoint_pos = fc.translate_along_local_z(pos=self.finger_midpoint_pos,
-                                                                 quat=self.hand_quat,
-                                                                 offset=self.asset_info_franka_table.franka_finger_length,
-                                                                 device=self.device)
-        # TODO: Add relative velocity term (see https://dynamicsmotioncontrol487379916.files.wordpress.com/2020/11/21-me258pointmovingrigidbody.pdf)
-        self.fingertip_midpoint_linvel = self.fingertip_centered_linvel + torch.cross(self.fingertip_centered_angvel,
-                                                                                      (self.fingertip_midpoint_pos - self.fingertip_centered_pos),
-                                                                                      dim=1)
-        self.fingertip_midpoint_jacobian = (self.left_finger_jacobian + self.right_finger_jacobian) * 0.5  # approximation
-
-        # Franka 2 
-        self.finger_midpoint_pos_2 = (self.left_finger_pos_2 + self.right_finger_pos_2) * 0.5
-        self.fingertip_midpoint_pos_2 = fc.translate_along_local_z(pos=self.finger_midpoint_pos_2,
-                                                                 quat=self.hand_quat_2,
-                                                                 offset=self.asset_info_franka_table.franka_finger_length,
-                                                                 device=self.device)
+        torch.index_select(self.body_state_view, 1, self._body_indices, out=self._selected_body_state)
+        torch.index_select(self.contact_force, 1, self._finger_body_indices, out=self._selected_contact_force)
+
+        # Franka 1 and Franka 2 are interleaved along the batch dim so that both are processed in one call
         # TODO: Add relative velocity term (see https://dynamicsmotioncontrol487379916.files.wordpress.com/2020/11/21-me258pointmovingrigidbody.pdf)
-        self.fingertip_midpoint_linvel_2 = self.fingertip_centered_linvel_2 + torch.cross(self.fingertip_centered_angvel_2,
-                                                                                      (self.fingertip_midpoint_pos_2 - self.fingertip_centered_pos_2),
-                                                                                      dim=1)
-        self.fingertip_midpoint_jacobian_2 = (self.left_finger_jacobian_2 + self.right_finger_jacobian_2) * 0.5  # approximation
+        body_state = self._selected_body_state_2b  # (2 * num_envs, 4, 13)
+        finger_midpoint_pos, fingertip_midpoint_pos, _ = \
+            fc.get_fingertip_midpoint_state(
+                left_finger_pos=body_state[:, 1, 0:3],
+                right_finger_pos=body_state[:, 2, 0:3],
+                hand_quat=body_state[:, 0, 3:7],
+                fingertip_centered_pos=body_state[:, 3, 0:3],
+                fingertip_centered_linvel=body_state[:, 3, 7:10],
+                fingertip_centered_angvel=body_state[:, 3, 10:13],
+                finger_offset=self._finger_offset,
+                fingertip_midpoint_linvel=self._fingertip_midpoint_linvel_buf,
+                offset_buf=self._offset_buf)
+        self.finger_midpoint_pos, self.finger_midpoint_pos_2 = finger_midpoint_pos.view(self.num_envs, 2, 3).unbind(1)
+        self.fingertip_midpoint_pos, self.fingertip_midpoint_pos_2 = \
+            fingertip_midpoint_pos.view(self.num_envs, 2, 3).unbind(1)
+
+        # Midpoint Jacobians are written in place into the buffers allocated in acquire_base_tensors
+        torch.lerp(self.left_finger_jacobian, self.right_finger_jacobian, 0.5, out=self._mid_jac_buf)  # approximation
+        torch.lerp(self.left_finger_jacobian_2, self.right_finger_jacobian_2, 0.5, out=self._mid_jac_buf_2)  # approximation
 
 
     def parse_controller_spec(self):
@@ -41,12 +41,57 @@ import os
 import sys
 import torch
 
+from gym import logger
 from isaacgym import gymapi, gymtorch, torch_utils
 from isaacgymenvs.tasks.base.vec_task import VecTask
 import isaacgymenvs.tasks.factory.factory_control as fc
 from isaacgymenvs.tasks.factory.factory_schema_class_base import FactoryABCBase
 from isaacgymenvs.tasks.factory.factory_schema_config_base import FactorySchemaConfigBase
 
+# Lower-level controller configuration for each ctrl_type: fixed cfg_ctrl values ('flags'), plain values copied from
+# cfg_task.ctrl.<ctrl_type> ('cfg_fields'), and lists from cfg_task.ctrl.<ctrl_type> turned into per-env tensors
+# ('tensor_fields')
+CTRL_SPECS = {
+    'gym_default': {
+        'flags': {'motor_ctrl_mode': 'gym', 'gain_space': 'joint'},
+        'cfg_fields': ['ik_method'],
+        'tensor_fields': ['joint_prop_gains', 'joint_deriv_gains', 'gripper_prop_gains', 'gripper_deriv_gains']},
+    'joint_space_ik': {
+        'flags': {'motor_ctrl_mode': 'manual', 'gain_space': 'joint', 'do_inertial_comp': False},
+        'cfg_fields': ['ik_method'],
+        'tensor_fields': ['joint_prop_gains', 'joint_deriv_gains']},
+    'joint_space_id': {
+        'flags': {'motor_ctrl_mode': 'manual', 'gain_space': 'joint', 'do_inertial_comp': True},
+        'cfg_fields': ['ik_method'],
+        'tensor_fields': ['joint_prop_gains', 'joint_deriv_gains']},
+    'task_space_impedance': {
+        'flags': {'motor_ctrl_mode': 'manual', 'gain_space': 'task', 'do_motion_ctrl': True, 'do_inertial_comp': False,
+                  'do_force_ctrl': False},
+        'cfg_fields': [],
+        'tensor_fields': ['task_prop_gains', 'task_deriv_gains', 'motion_ctrl_axes']},
+    'operational_space_motion': {
+        'flags': {'motor_ctrl_mode': 'manual', 'gain_space': 'task', 'do_motion_ctrl': True, 'do_inertial_comp': True,
+                  'do_force_ctrl': False},
+        'cfg_fields': [],
+        'tensor_fields': ['task_prop_gains', 'task_deriv_gains', 'motion_ctrl_axes']},
+    'open_loop_force': {
+        'flags': {'motor_ctrl_mode': 'manual', 'gain_space': 'task', 'do_motion_ctrl': False, 'do_force_ctrl': True,
+                  'force_ctrl_method': 'open'},
+        'cfg_fields': [],
+        'tensor_fields': ['force_ctrl_axes']},
+    'closed_loop_force': {
+        'flags': {'motor_ctrl_mode': 'manual', 'gain_space': 'task', 'do_motion_ctrl': False, 'do_force_ctrl': True,
+                  'force_ctrl_method': 'closed'},
+        'cfg_fields': [],
+        'tensor_fields': ['wrench_prop_gains', 'force_ctrl_axes']},
+    'hybrid_force_motion': {
+        'flags': {'motor_ctrl_mode': 'manual', 'gain_space': 'task', 'do_motion_ctrl': True, 'do_inertial_comp': True,
+                  'do_force_ctrl': True, 'force_ctrl_method': 'closed'},
+        'cfg_fields': [],
+        'tensor_fields': ['task_prop_gains', 'task_deriv_gains', 'motion_ctrl_axes', 'wrench_prop_gains',
+                          'force_ctrl_axes']},
+}
+
 
 class FactoryBase_MARL2(VecTask, FactoryABCBase):
 
@@ -125,6 +170,7 @@ class FactoryBase_MARL2(VecTask, FactoryABCBase):
                                       graphics_device=self.graphics_device_id,
                                       physics_engine=self.physics_engine,
                                       sim_params=self.sim_params)
+        self._gravity_z = self.sim_params.gravity.z  # last gravity set on the sim; see enable_gravity()
         self._create_ground_plane()
         self.create_envs()  # defined in subclass
 
@@ -209,7 +255,7 @@ class FactoryBase_MARL2(VecTask, FactoryABCBase):
         _mass_matrix = self.gym.acquire_mass_matrix_tensor(self.sim, 'franka')  # shape = (num_envs, num_dofs, num_dofs)
         second_mass_matrix = self.gym.acquire_mass_matrix_tensor(self.sim, 'second_franka')  # shape = (num_envs, num_dofs, num_dofs)
         
-        print ("_root_state.shape ", self.num_actors)
+        logger.debug("_root_state.shape %s", self.num_actors)
 
         self.root_state = gymtorch.wrap_tensor(_root_state)
         self.body_state = gymtorch.wrap_tensor(_body_state)
@@ -233,23 +279,23 @@ class FactoryBase_MARL2(VecTask, FactoryABCBase):
         self.dof_vel = self.dof_state.view(self.num_envs, self.num_dofs, 2)[..., 1]
         self.dof_force_view = self.dof_force.view(self.num_envs, self.num_dofs, 1)[..., 0]
         self.contact_force = self.contact_force.view(self.num_envs, self.num_bodies, 3)[..., 0:3]
-        print ("dof_pos: ", self.dof_pos.shape)
+        logger.debug("dof_pos: %s", tuple(self.dof_pos.shape))
 
         self.arm_dof_pos = self.dof_pos[:, 0:7]
         self.arm_mass_matrix = self.mass_matrix[:, 0:7, 0:7]  # for Franka arm (not gripper)   
-        print ("hand_body_id_env ", self.hand_body_id_env)        
+        logger.debug("hand_body_id_env %s", self.hand_body_id_env)
         self.hand_pos = self.body_pos[:, self.hand_body_id_env, 0:3]
         self.hand_quat = self.body_quat[:, self.hand_body_id_env, 0:4]
         self.hand_linvel = self.body_linvel[:, self.hand_body_id_env, 0:3]
         self.hand_angvel = self.body_angvel[:, self.hand_body_id_env, 0:3]
         self.hand_jacobian = self.jacobian[:, self.hand_body_id_env - 1, 0:6, 0:7]  # minus 1 because base is fixed
-        print ("left_finger_body_id_env ", self.left_finger_body_id_env)
+        logger.debug("left_finger_body_id_env %s", self.left_finger_body_id_env)
         self.left_finger_pos = self.body_pos[:, self.left_finger_body_id_env, 0:3]
         self.left_finger_quat = self.body_quat[:, self.left_finger_body_id_env, 0:4]
         self.left_finger_linvel = self.body_linvel[:, self.left_finger_body_id_env, 0:3]
         self.left_finger_angvel = self.body_angvel[:, self.left_finger_body_id_env, 0:3]
         self.left_finger_jacobian = self.jacobian[:, self.left_finger_body_id_env - 1, 0:6, 0:7]  # minus 1 because base is fixed
-        print ("right_finger_body_id_env ", self.right_finger_body_id_env)
+        logger.debug("right_finger_body_id_env %s", self.right_finger_body_id_env)
         self.right_finger_pos = self.body_pos[:, self.right_finger_body_id_env, 0:3]
         self.right_finger_quat = self.body_quat[:, self.right_finger_body_id_env, 0:4]
         self.right_finger_linvel = self.body_linvel[:, self.right_finger_body_id_env, 0:3]
@@ -278,7 +324,9 @@ class FactoryBase_MARL2(VecTask, FactoryABCBase):
         self.fingertip_midpoint_angvel = self.fingertip_centered_angvel  # always equal
         self.fingertip_midpoint_jacobian = (self.left_finger_jacobian + self.right_finger_jacobian) * 0.5  # approximation
 
-        self.dof_torque = torch.zeros((self.num_envs, self.num_dofs), device=self.device)
+        # DOF torques of both Frankas in sim DOF order (Franka 1: 0-8, Franka 2: 9-17); _set_dof_torque writes in place
+        self.dof_torque_full = torch.zeros((self.num_envs, self.num_dofs), device=self.device)
+        self.dof_torque = self.dof_torque_full[:, :9]
         self.fingertip_contact_wrench = torch.zeros((self.num_envs, 6), device=self.device)
 
         self.ctrl_target_fingertip_midpoint_pos = torch.zeros((self.num_envs, 3), device=self.device)
@@ -289,19 +337,19 @@ class FactoryBase_MARL2(VecTask, FactoryABCBase):
         # Second Franka 
         self.second_arm_dof_pos = self.dof_pos[:, 9:16]
         self.second_arm_mass_matrix = self.second_mass_matrix[:, 0:7, 0:7]  # for Franka arm (not gripper)   
-        print ("hand_body_id_env ", self.hand_body_id_env)        
+        logger.debug("hand_body_id_env %s", self.hand_body_id_env)
         self.second_hand_pos = self.body_pos[:, self.second_hand_body_id_env, 0:3]
         self.second_hand_quat = self.body_quat[:, self.second_hand_body_id_env, 0:4]
         self.second_hand_linvel = self.body_linvel[:, self.second_hand_body_id_env, 0:3]
         self.second_hand_angvel = self.body_angvel[:, self.second_hand_body_id_env, 0:3]
         self.second_hand_jacobian = self.second_jacobian[:, self.hand_body_id_env - 1, 0:6, 0:7]  # minus 1 because base is fixed
-        print ("left_finger_body_id_env ", self.second_left_finger_body_id_env)
+        logger.debug("left_finger_body_id_env %s", self.second_left_finger_body_id_env)
         self.second_left_finger_pos = self.body_pos[:, self.second_left_finger_body_id_env, 0:3]
         self.second_left_finger_quat = self.body_quat[:, self.second_left_finger_body_id_env, 0:4]
         self.second_left_finger_linvel = self.body_linvel[:, self.second_left_finger_body_id_env, 0:3]
         self.second_left_finger_angvel = self.body_angvel[:, self.second_left_finger_body_id_env, 0:3]
         self.second_left_finger_jacobian = self.second_jacobian[:, self.left_finger_body_id_env - 1, 0:6, 0:7]  # minus 1 because base is fixed
-        print ("right_finger_body_id_env ", self.second_right_finger_body_id_env)
+        logger.debug("right_finger_body_id_env %s", self.second_right_finger_body_id_env)
         self.second_right_finger_pos = self.body_pos[:, self.second_right_finger_body_id_env, 0:3]
         self.second_right_finger_quat = self.body_quat[:, self.second_right_finger_body_id_env, 0:4]
         self.second_right_finger_linvel = self.body_linvel[:, self.second_right_finger_body_id_env, 0:3]
@@ -330,7 +378,7 @@ class FactoryBase_MARL2(VecTask, FactoryABCBase):
         self.second_fingertip_midpoint_angvel = self.second_fingertip_centered_angvel  # always equal
         self.second_fingertip_midpoint_jacobian = (self.second_left_finger_jacobian + self.right_finger_jacobian) * 0.5  # approximation
 
-        self.second_dof_torque = torch.zeros((self.num_envs, self.num_dofs), device=self.device)
+        self.second_dof_torque = self.dof_torque_full[:, 9:]
         self.second_fingertip_contact_wrench = torch.zeros((self.num_envs, 6), device=self.device)
 
         self.second_ctrl_target_fingertip_midpoint_pos = torch.zeros((self.num_envs, 3), device=self.device)
@@ -341,6 +389,17 @@ class FactoryBase_MARL2(VecTask, FactoryABCBase):
 
         self.prev_actions = torch.zeros((self.num_envs, self.num_actions), device=self.device)
 
+        # Finger length along local Z, shared by both Frankas; built once instead of every refresh
+        self._finger_offset = torch.zeros((self.num_envs, 3), device=self.device)
+        self._finger_offset[:, 2] = self.asset_info_franka_table.franka_finger_length
+
+        # Actor ids of both Frankas in sim order, as passed to the indexed DOF setters; constant after env creation
+        self.franka_actor_ids_sim_concat = torch.sort(
+            torch.cat((self.franka_actor_ids_sim, self.second_franka_actor_ids_sim), dim=-1)).values.flatten()
+        # Index counts as Python ints, so the setters don't query tensor sizes every step
+        self._n_franka_ids = int(self.franka_actor_ids_sim.numel())
+        self._n_franka_ids_concat = 2 * self._n_franka_ids
+
     def refresh_base_tensors(self):
         """Refresh tensors."""
         # NOTE: Tensor refresh functions should be called once per step, before setters.
@@ -354,27 +413,28 @@ class FactoryBase_MARL2(VecTask, FactoryABCBase):
         self.gym.refresh_mass_matrix_tensors(self.sim)        
         # print ("self.arm_mass_matrix ", self.mass_matrix[0])
         # print ("self.second_mass_matrix ", self.second_mass_matrix[0])
-        self.finger_midpoint_pos = (self.left_finger_pos + self.right_finger_pos) * 0.5
-        self.fingertip_midpoint_pos = fc.translate_along_local_z(pos=self.finger_midpoint_pos,
-                                                                 quat=self.hand_quat,
-                                                                 offset=self.asset_info_franka_table.franka_finger_length,
-                                                                 device=self.device)
+        # Midpoint pos and the component-wise linvel cross product are fused in a scripted helper
         # TODO: Add relative velocity term (see https://dynamicsmotioncontrol487379916.files.wordpress.com/2020/11/21-me258pointmovingrigidbody.pdf)
-        self.fingertip_midpoint_linvel = self.fingertip_centered_linvel + torch.cross(self.fingertip_centered_angvel,
-                                                                                      (self.fingertip_midpoint_pos - self.fingertip_centered_pos),
-                                                                                      dim=1)
+        self.finger_midpoint_pos, self.fingertip_midpoint_pos, self.fingertip_midpoint_linvel = \
+            fc.get_fingertip_midpoint_state(left_finger_pos=self.left_finger_pos,
+                                            right_finger_pos=self.right_finger_pos,
+                                            hand_quat=self.hand_quat,
+                                            fingertip_centered_pos=self.fingertip_centered_pos,
+                                            fingertip_centered_linvel=self.fingertip_centered_linvel,
+                                            fingertip_centered_angvel=self.fingertip_centered_angvel,
+                                            finger_offset=self._finger_offset)
         self.fingertip_midpoint_jacobian = (self.left_finger_jacobian + self.right_finger_jacobian) * 0.5  # approximation
         
         # Second Franka
-        self.second_finger_midpoint_pos = (self.second_left_finger_pos + self.second_right_finger_pos) * 0.5
-        self.second_fingertip_midpoint_pos = fc.translate_along_local_z(pos=self.second_finger_midpoint_pos,
-                                                                 quat=self.second_hand_quat,
-                                                                 offset=self.asset_info_franka_table.franka_finger_length,
-                                                                 device=self.device)
         # TODO: Add relative velocity term (see https://dynamicsmotioncontrol487379916.files.wordpress.com/2020/11/21-me258pointmovingrigidbody.pdf)
-        self.second_fingertip_midpoint_linvel = self.second_fingertip_centered_linvel + torch.cross(self.second_fingertip_centered_angvel,
-                                                                                      (self.second_fingertip_midpoint_pos - self.second_fingertip_centered_pos),
-                                                                                      dim=1)
+        self.second_finger_midpoint_pos, self.second_fingertip_midpoint_pos, self.second_fingertip_midpoint_linvel = \
+            fc.get_fingertip_midpoint_state(left_finger_pos=self.second_left_finger_pos,
+                                            right_finger_pos=self.second_right_finger_pos,
+                                            hand_quat=self.second_hand_quat,
+                                            fingertip_centered_pos=self.second_fingertip_centered_pos,
+                                            fingertip_centered_linvel=self.second_fingertip_centered_linvel,
+                                            fingertip_centered_angvel=self.second_fingertip_centered_angvel,
+                                            finger_offset=self._finger_offset)
         self.second_fingertip_midpoint_jacobian = (self.second_left_finger_jacobian + self.second_right_finger_jacobian) * 0.5  # approximation
 
 
@@ -404,103 +464,42 @@ class FactoryBase_MARL2(VecTask, FactoryABCBase):
 
         self.cfg_ctrl['num_envs'] = self.num_envs
         self.cfg_ctrl['jacobian_type'] = self.cfg_task.ctrl.all.jacobian_type
-        self.cfg_ctrl['gripper_prop_gains'] = torch.tensor(self.cfg_task.ctrl.all.gripper_prop_gains,
-                                                           device=self.device).repeat((self.num_envs, 1))
-        self.cfg_ctrl['gripper_deriv_gains'] = torch.tensor(self.cfg_task.ctrl.all.gripper_deriv_gains,
-                                                            device=self.device).repeat((self.num_envs, 1))
 
         ctrl_type = self.cfg_task.ctrl.ctrl_type
-        if ctrl_type == 'gym_default':
-            self.cfg_ctrl['motor_ctrl_mode'] = 'gym'
-            self.cfg_ctrl['gain_space'] = 'joint'
-            self.cfg_ctrl['ik_method'] = self.cfg_task.ctrl.gym_default.ik_method
-            self.cfg_ctrl['joint_prop_gains'] = torch.tensor(self.cfg_task.ctrl.gym_default.joint_prop_gains,
-                                                             device=self.device).repeat((self.num_envs, 1))
-            self.cfg_ctrl['joint_deriv_gains'] = torch.tensor(self.cfg_task.ctrl.gym_default.joint_deriv_gains,
-                                                              device=self.device).repeat((self.num_envs, 1))
-            self.cfg_ctrl['gripper_prop_gains'] = torch.tensor(self.cfg_task.ctrl.gym_default.gripper_prop_gains,
-                                                               device=self.device).repeat((self.num_envs, 1))
-            self.cfg_ctrl['gripper_deriv_gains'] = torch.tensor(self.cfg_task.ctrl.gym_default.gripper_deriv_gains,
-                                                                device=self.device).repeat((self.num_envs, 1))
-        elif ctrl_type == 'joint_space_ik':
-            self.cfg_ctrl['motor_ctrl_mode'] = 'manual'
-            self.cfg_ctrl['gain_space'] = 'joint'
-            self.cfg_ctrl['ik_method'] = self.cfg_task.ctrl.joint_space_ik.ik_method
-            self.cfg_ctrl['joint_prop_gains'] = torch.tensor(self.cfg_task.ctrl.joint_space_ik.joint_prop_gains,
-                                                             device=self.device).repeat((self.num_envs, 1))
-            self.cfg_ctrl['joint_deriv_gains'] = torch.tensor(self.cfg_task.ctrl.joint_space_ik.joint_deriv_gains,
-                                                              device=self.device).repeat((self.num_envs, 1))
-            self.cfg_ctrl['do_inertial_comp'] = False
-        elif ctrl_type == 'joint_space_id':
-            self.cfg_ctrl['motor_ctrl_mode'] = 'manual'
-            self.cfg_ctrl['gain_space'] = 'joint'
-            self.cfg_ctrl['ik_method'] = self.cfg_task.ctrl.joint_space_id.ik_method
-            self.cfg_ctrl['joint_prop_gains'] = torch.tensor(self.cfg_task.ctrl.joint_space_id.joint_prop_gains,
-                                                             device=self.device).repeat((self.num_envs, 1))
-            self.cfg_ctrl['joint_deriv_gains'] = torch.tensor(self.cfg_task.ctrl.joint_space_id.joint_deriv_gains,
-                                                              device=self.device).repeat((self.num_envs, 1))
-            self.cfg_ctrl['do_inertial_comp'] = True
-        elif ctrl_type == 'task_space_impedance':
-            self.cfg_ctrl['motor_ctrl_mode'] = 'manual'
-            self.cfg_ctrl['gain_space'] = 'task'
-            self.cfg_ctrl['do_motion_ctrl'] = True
-            self.cfg_ctrl['task_prop_gains'] = torch.tensor(self.cfg_task.ctrl.task_space_impedance.task_prop_gains,
-                                                            device=self.device).repeat((self.num_envs, 1))
-            self.cfg_ctrl['task_deriv_gains'] = torch.tensor(self.cfg_task.ctrl.task_space_impedance.task_deriv_gains,
-                                                             device=self.device).repeat((self.num_envs, 1))
-            self.cfg_ctrl['do_inertial_comp'] = False
-            self.cfg_ctrl['motion_ctrl_axes'] = torch.tensor(self.cfg_task.ctrl.task_space_impedance.motion_ctrl_axes,
-                                                             device=self.device).repeat((self.num_envs, 1))
-            self.cfg_ctrl['do_force_ctrl'] = False
-        elif ctrl_type == 'operational_space_motion':
-            self.cfg_ctrl['motor_ctrl_mode'] = 'manual'
-            self.cfg_ctrl['gain_space'] = 'task'
-            self.cfg_ctrl['do_motion_ctrl'] = True
-            self.cfg_ctrl['task_prop_gains'] = torch.tensor(self.cfg_task.ctrl.operational_space_motion.task_prop_gains,
-                                                            device=self.device).repeat((self.num_envs, 1))
-            self.cfg_ctrl['task_deriv_gains'] = torch.tensor(
-                self.cfg_task.ctrl.operational_space_motion.task_deriv_gains, device=self.device).repeat(
-                (self.num_envs, 1))
-            self.cfg_ctrl['do_inertial_comp'] = True
-            self.cfg_ctrl['motion_ctrl_axes'] = torch.tensor(
-                self.cfg_task.ctrl.operational_space_motion.motion_ctrl_axes, device=self.device).repeat(
-                (self.num_envs, 1))
-            self.cfg_ctrl['do_force_ctrl'] = False
-        elif ctrl_type == 'open_loop_force':
-            self.cfg_ctrl['motor_ctrl_mode'] = 'manual'
-            self.cfg_ctrl['gain_space'] = 'task'
-            self.cfg_ctrl['do_motion_ctrl'] = False
-            self.cfg_ctrl['do_force_ctrl'] = True
-            self.cfg_ctrl['force_ctrl_method'] = 'open'
-            self.cfg_ctrl['force_ctrl_axes'] = torch.tensor(self.cfg_task.ctrl.open_loop_force.force_ctrl_axes,
-                                                            device=self.device).repeat((self.num_envs, 1))
-        elif ctrl_type == 'closed_loop_force':
-            self.cfg_ctrl['motor_ctrl_mode'] = 'manual'
-            self.cfg_ctrl['gain_space'] = 'task'
-            self.cfg_ctrl['do_motion_ctrl'] = False
-            self.cfg_ctrl['do_force_ctrl'] = True
-            self.cfg_ctrl['force_ctrl_method'] = 'closed'
-            self.cfg_ctrl['wrench_prop_gains'] = torch.tensor(self.cfg_task.ctrl.closed_loop_force.wrench_prop_gains,
-                                                              device=self.device).repeat((self.num_envs, 1))
-            self.cfg_ctrl['force_ctrl_axes'] = torch.tensor(self.cfg_task.ctrl.closed_loop_force.force_ctrl_axes,
-                                                            device=self.device).repeat((self.num_envs, 1))
-        elif ctrl_type == 'hybrid_force_motion':
-            self.cfg_ctrl['motor_ctrl_mode'] = 'manual'
-            self.cfg_ctrl['gain_space'] = 'task'
-            self.cfg_ctrl['do_motion_ctrl'] = True
-            self.cfg_ctrl['task_prop_gains'] = torch.tensor(self.cfg_task.ctrl.hybrid_force_motion.task_prop_gains,
-                                                            device=self.device).repeat((self.num_envs, 1))
-            self.cfg_ctrl['task_deriv_gains'] = torch.tensor(self.cfg_task.ctrl.hybrid_force_motion.task_deriv_gains,
-                                                             device=self.device).repeat((self.num_envs, 1))
-            self.cfg_ctrl['do_inertial_comp'] = True
-            self.cfg_ctrl['motion_ctrl_axes'] = torch.tensor(self.cfg_task.ctrl.hybrid_force_motion.motion_ctrl_axes,
-                                                             device=self.device).repeat((self.num_envs, 1))
-            self.cfg_ctrl['do_force_ctrl'] = True
-            self.cfg_ctrl['force_ctrl_method'] = 'closed'
-            self.cfg_ctrl['wrench_prop_gains'] = torch.tensor(self.cfg_task.ctrl.hybrid_force_motion.wrench_prop_gains,
-                                                              device=self.device).repeat((self.num_envs, 1))
-            self.cfg_ctrl['force_ctrl_axes'] = torch.tensor(self.cfg_task.ctrl.hybrid_force_motion.force_ctrl_axes,
-                                                            device=self.device).repeat((self.num_envs, 1))
+        if ctrl_type != 'gym_default':  # gym_default sets its own gripper gains below
+            self.cfg_ctrl['gripper_prop_gains'] = torch.as_tensor(self.cfg_task.ctrl.all.gripper_prop_gains,
+                                                                  device=self.device,
+                                                                  dtype=torch.float32).unsqueeze(0).expand(self.num_envs, -1)
+            self.cfg_ctrl['gripper_deriv_gains'] = torch.as_tensor(self.cfg_task.ctrl.all.gripper_deriv_gains,
+                                                                   device=self.device,
+                                                                   dtype=torch.float32).unsqueeze(0).expand(self.num_envs, -1)
+
+        spec = CTRL_SPECS[ctrl_type]
+        cfg_ctrl_type = self.cfg_task.ctrl[ctrl_type]
+        self.cfg_ctrl.update(spec['flags'])
+        for key in spec['cfg_fields']:
+            self.cfg_ctrl[key] = cfg_ctrl_type[key]
+        for key in spec['tensor_fields']:
+            self.cfg_ctrl[key] = torch.as_tensor(cfg_ctrl_type[key], device=self.device,
+                                                 dtype=torch.float32).unsqueeze(0).expand(self.num_envs, -1)
+
+        # Both Frankas share the same controller config; the batched copy covers the two arms stacked along the batch
+        # dim, as they are passed to fc.compute_dof_torque in _set_dof_torque
+        self.cfg_ctrl_batched = {key: value[:1].expand(2 * self.num_envs, -1) if isinstance(value, torch.Tensor) else value
+                                 for key, value in self.cfg_ctrl.items()}
+        self.cfg_ctrl_batched['num_envs'] = 2 * self.num_envs
+
+        # Jacobian type and motor control mode are fixed from here on; bind the per-step handlers once
+        if self.cfg_ctrl['jacobian_type'] == 'geometric':
+            self._set_jacobian_tf = self._set_geometric_jacobian_tf
+        elif self.cfg_ctrl['jacobian_type'] == 'analytic':
+            self._set_jacobian_tf = self._set_analytic_jacobian_tf
+        else:
+            self._set_jacobian_tf = lambda: None
+        if self.cfg_ctrl['motor_ctrl_mode'] == 'gym':
+            self._apply_ctrl = self._set_dof_pos_target
+        elif self.cfg_ctrl['motor_ctrl_mode'] == 'manual':
+            self._apply_ctrl = self._set_dof_torque
 
         if self.cfg_ctrl['motor_ctrl_mode'] == 'gym':
             prop_gains = torch.cat((self.cfg_ctrl['joint_prop_gains'],
@@ -516,33 +515,41 @@ class FactoryBase_MARL2(VecTask, FactoryABCBase):
                 franka_dof_props['damping'] = deriv_gain
                 self.gym.set_actor_dof_properties(env_ptr, franka_handle, franka_dof_props)
         elif self.cfg_ctrl['motor_ctrl_mode'] == 'manual':
-            # No tensor API for getting/setting actor DOF props; thus, loop required
-            for env_ptr, franka_handle in zip(self.env_ptrs, self.franka_handles):
-                franka_dof_props = self.gym.get_actor_dof_properties(env_ptr, franka_handle)
-                franka_dof_props['driveMode'][:] = gymapi.DOF_MODE_EFFORT
-                franka_dof_props['stiffness'][:] = 0.0  # zero passive stiffness
-                franka_dof_props['damping'][:] = 0.0  # zero passive damping
+            # Both Frankas use the same asset, so the DOF props are identical; build them once and reuse
+            franka_dof_props = self.gym.get_actor_dof_properties(self.env_ptrs[0], self.franka_handles[0])
+            franka_dof_props['driveMode'][:] = gymapi.DOF_MODE_EFFORT
+            franka_dof_props['stiffness'][:] = 0.0  # zero passive stiffness
+            franka_dof_props['damping'][:] = 0.0  # zero passive damping
+            # No tensor API for setting actor DOF props; thus, loop required
+            # NOTE: franka_handles holds [franka, second_franka] for each env in turn
+            for env_ptr, franka_handle, second_franka_handle in zip(self.env_ptrs, self.franka_handles[0::2],
+                                                                    self.franka_handles[1::2]):
                 self.gym.set_actor_dof_properties(env_ptr, franka_handle, franka_dof_props)
+                self.gym.set_actor_dof_properties(env_ptr, second_franka_handle, franka_dof_props)
 
     def generate_ctrl_signals(self):
         """Get Jacobian. Set Franka DOF position targets or DOF torques."""
 
         # Get desired Jacobian
-        if self.cfg_ctrl['jacobian_type'] == 'geometric':
-            self.fingertip_midpoint_jacobian_tf = self.fingertip_midpoint_jacobian
-            self.second_fingertip_midpoint_jacobian_tf = self.second_fingertip_midpoint_jacobian
-        elif self.cfg_ctrl['jacobian_type'] == 'analytic':
-            self.fingertip_midpoint_jacobian_tf = fc.get_analytic_jacobian(
-                fingertip_quat=self.fingertip_quat,
-                fingertip_jacobian=self.fingertip_midpoint_jacobian,
-                num_envs=self.num_envs,
-                device=self.device)
+        self._set_jacobian_tf()
 
         # Set PD joint pos target or joint torque
-        if self.cfg_ctrl['motor_ctrl_mode'] == 'gym':
-            self._set_dof_pos_target()
-        elif self.cfg_ctrl['motor_ctrl_mode'] == 'manual':
-            self._set_dof_torque()
+        self._apply_ctrl()
+
+    def _set_geometric_jacobian_tf(self):
+        """Use geometric Jacobian as desired Jacobian."""
+
+        self.fingertip_midpoint_jacobian_tf = self.fingertip_midpoint_jacobian
+        self.second_fingertip_midpoint_jacobian_tf = self.second_fingertip_midpoint_jacobian
+
+    def _set_analytic_jacobian_tf(self):
+        """Use analytic Jacobian as desired Jacobian."""
+
+        self.fingertip_midpoint_jacobian_tf = fc.get_analytic_jacobian(
+            fingertip_quat=self.fingertip_quat,
+            fingertip_jacobian=self.fingertip_midpoint_jacobian,
+            num_envs=self.num_envs,
+            device=self.device)
 
     def _set_dof_pos_target(self):
         """Set Franka DOF position target to move fingertips towards target pose."""
@@ -560,63 +567,68 @@ class FactoryBase_MARL2(VecTask, FactoryABCBase):
         self.gym.set_dof_position_target_tensor_indexed(self.sim,
                                                         gymtorch.unwrap_tensor(self.ctrl_target_dof_pos),
                                                         gymtorch.unwrap_tensor(self.franka_actor_ids_sim),
-                                                        2*len(self.franka_actor_ids_sim))
+                                                        self._n_franka_ids_concat)
 
     def _set_dof_torque(self):
-        """Set Franka DOF torque to move fingertips towards target pose."""        
-        self.dof_torque = fc.compute_dof_torque(
-            cfg_ctrl=self.cfg_ctrl,
-            dof_pos=self.dof_pos[:,:9],
-            dof_vel=self.dof_vel[:,:9],
-            fingertip_midpoint_pos=self.fingertip_midpoint_pos,
-            fingertip_midpoint_quat=self.fingertip_midpoint_quat,
-            fingertip_midpoint_linvel=self.fingertip_midpoint_linvel,
-            fingertip_midpoint_angvel=self.fingertip_midpoint_angvel,
-            left_finger_force=self.left_finger_force,
-            right_finger_force=self.right_finger_force,
-            jacobian=self.fingertip_midpoint_jacobian_tf,
-            arm_mass_matrix=self.arm_mass_matrix,
-            ctrl_target_gripper_dof_pos=self.ctrl_target_gripper_dof_pos,
-            ctrl_target_fingertip_midpoint_pos=self.ctrl_target_fingertip_midpoint_pos,
-            ctrl_target_fingertip_midpoint_quat=self.ctrl_target_fingertip_midpoint_quat,
-            ctrl_target_fingertip_contact_wrench=self.ctrl_target_fingertip_contact_wrench,
+        """Set Franka DOF torque to move fingertips towards target pose."""
+
+        # Franka 1 and Franka 2 are stacked along the batch dim so that the torque is computed in one call
+        dof_torque = fc.compute_dof_torque(
+            cfg_ctrl=self.cfg_ctrl_batched,
+            dof_pos=torch.cat((self.dof_pos[:, :9], self.dof_pos[:, 9:]), dim=0),
+            dof_vel=torch.cat((self.dof_vel[:, :9], self.dof_vel[:, 9:]), dim=0),
+            fingertip_midpoint_pos=torch.cat((self.fingertip_midpoint_pos, self.second_fingertip_midpoint_pos), dim=0),
+            fingertip_midpoint_quat=torch.cat((self.fingertip_midpoint_quat, self.second_fingertip_midpoint_quat), dim=0),
+            fingertip_midpoint_linvel=torch.cat((self.fingertip_midpoint_linvel, self.second_fingertip_midpoint_linvel),
+                                                dim=0),
+            fingertip_midpoint_angvel=torch.cat((self.fingertip_midpoint_angvel, self.second_fingertip_midpoint_angvel),
+                                                dim=0),
+            left_finger_force=torch.cat((self.left_finger_force, self.second_left_finger_force), dim=0),
+            right_finger_force=torch.cat((self.right_finger_force, self.second_right_finger_force), dim=0),
+            jacobian=torch.cat((self.fingertip_midpoint_jacobian_tf, self.second_fingertip_midpoint_jacobian_tf), dim=0),
+            arm_mass_matrix=torch.cat((self.arm_mass_matrix, self.second_arm_mass_matrix), dim=0),
+            ctrl_target_gripper_dof_pos=torch.cat(
+                (torch.as_tensor(self.ctrl_target_gripper_dof_pos, device=self.device).expand(self.num_envs, 2),
+                 torch.as_tensor(self.second_ctrl_target_gripper_dof_pos, device=self.device).expand(self.num_envs, 2)),
+                dim=0),
+            ctrl_target_fingertip_midpoint_pos=torch.cat((self.ctrl_target_fingertip_midpoint_pos,
+                                                          self.second_ctrl_target_fingertip_midpoint_pos), dim=0),
+            ctrl_target_fingertip_midpoint_quat=torch.cat((self.ctrl_target_fingertip_midpoint_quat,
+                                                           self.second_ctrl_target_fingertip_midpoint_quat), dim=0),
+            ctrl_target_fingertip_contact_wrench=torch.cat((self.ctrl_target_fingertip_contact_wrench,
+                                                            self.second_ctrl_target_fingertip_contact_wrench), dim=0),
             device=self.device)
+        # Scatter (arm, env, dof) rows into the (env, arm * dof) layout of the actuation tensor;
+        # dof_torque and second_dof_torque are views of dof_torque_full
+        self.dof_torque_full.view(self.num_envs, 2, 9).copy_(dof_torque.view(2, self.num_envs, 9).transpose(0, 1))
 
-        self.second_dof_torque = fc.compute_dof_torque(
-            cfg_ctrl=self.cfg_ctrl,
-            dof_pos=self.dof_pos[:,9:],
-            dof_vel=self.dof_vel[:,9:],
-            fingertip_midpoint_pos=self.second_fingertip_midpoint_pos,
-            fingertip_midpoint_quat=self.second_fingertip_midpoint_quat,
-            fingertip_midpoint_linvel=self.second_fingertip_midpoint_linvel,
-            fingertip_midpoint_angvel=self.second_fingertip_midpoint_angvel,
-            left_finger_force=self.second_left_finger_force,
-            right_finger_force=self.second_right_finger_force,
-            jacobian=self.second_fingertip_midpoint_jacobian_tf,
-            arm_mass_matrix=self.second_arm_mass_matrix,
-            ctrl_target_gripper_dof_pos=self.second_ctrl_target_gripper_dof_pos,
-            ctrl_target_fingertip_midpoint_pos=self.second_ctrl_target_fingertip_midpoint_pos,
-            ctrl_target_fingertip_midpoint_quat=self.second_ctrl_target_fingertip_midpoint_quat,
-            ctrl_target_fingertip_contact_wrench=self.second_ctrl_target_fingertip_contact_wrench,
-            device=self.device)
         self.gym.set_dof_actuation_force_tensor_indexed(self.sim,
-                                                        gymtorch.unwrap_tensor(torch.cat((self.dof_torque, self.second_dof_torque), dim=-1)),
-                                                        gymtorch.unwrap_tensor(torch.sort(torch.cat((self.franka_actor_ids_sim, self.second_franka_actor_ids_sim), dim=-1)).values.flatten()),
-                                                        2*len(self.franka_actor_ids_sim))
+                                                        gymtorch.unwrap_tensor(self.dof_torque_full),
+                                                        gymtorch.unwrap_tensor(self.franka_actor_ids_sim_concat),
+                                                        self._n_franka_ids_concat)
 
     def enable_gravity(self, gravity_mag):
         """Enable gravity."""
 
+        # Skip the sim params round trip if gravity is already set to the requested value
+        if self._gravity_z == -gravity_mag:
+            return
+
         sim_params = self.gym.get_sim_params(self.sim)
         sim_params.gravity.z = -gravity_mag
         self.gym.set_sim_params(self.sim, sim_params)
+        self._gravity_z = -gravity_mag
 
     def disable_gravity(self):
         """Disable gravity."""
 
+        if self._gravity_z == 0.0:
+            return
+
         sim_params = self.gym.get_sim_params(self.sim)
         sim_params.gravity.z = 0.0
         self.gym.set_sim_params(self.sim, sim_params)
+        self._gravity_z = 0.0
 
     def export_scene(self, label):
         """Export scene to USD."""
@@ -632,24 +644,29 @@ class FactoryBase_MARL2(VecTask, FactoryABCBase):
         """Extract poses of all bodies."""
 
         if not hasattr(self, 'export_pos'):
-            self.export_pos = []
-            self.export_rot = []
+            # Preallocate the whole trajectory in (pinned) host memory; frames are written in place
+            self._export_pin_memory = self.body_pos.is_cuda
+            self.export_pos = torch.empty((self.max_episode_length, *self.body_pos.shape), dtype=self.body_pos.dtype,
+                                          pin_memory=self._export_pin_memory)
+            self.export_rot = torch.empty((self.max_episode_length, *self.body_quat.shape), dtype=self.body_quat.dtype,
+                                          pin_memory=self._export_pin_memory)
             self.frame_count = 0
 
-        pos = self.body_pos
-        rot = self.body_quat
-
-        self.export_pos.append(pos.cpu().numpy().copy())
-        self.export_rot.append(rot.cpu().numpy().copy())
+        # Copy without blocking on the device; synchronized once before saving
+        self.export_pos[self.frame_count].copy_(self.body_pos, non_blocking=True)
+        self.export_rot[self.frame_count].copy_(self.body_quat, non_blocking=True)
         self.frame_count += 1
 
-        if len(self.export_pos) == self.max_episode_length:
+        if self.frame_count == self.max_episode_length:
             output_dir = self.__class__.__name__
             save_dir = os.path.join('usd', output_dir)
             os.makedirs(output_dir, exist_ok=True)
 
+            if self._export_pin_memory:
+                torch.cuda.synchronize()
+
             print(f'Exporting poses to {output_dir}...')
-            np.save(os.path.join(save_dir, 'body_position.npy'), np.array(self.export_pos))
-            np.save(os.path.join(save_dir, 'body_rotation.npy'), np.array(self.export_rot))
+            np.save(os.path.join(save_dir, 'body_position.npy'), self.export_pos.numpy())
+            np.save(os.path.join(save_dir, 'body_rotation.npy'), self.export_rot.numpy())
             print('Export completed.')
             sys.exit()
@@ -33,6 +33,7 @@ Imported by base, environment, and task classes. Not directly executed.
 
 import math
 import torch
+from typing import Optional
 
 from isaacgym import torch_utils
 
@@ -177,7 +178,7 @@ def compute_dof_torque(cfg_ctrl,
                 arm_mass_matrix_task = torch.inverse(jacobian @ torch.inverse(arm_mass_matrix) @ jacobian_T)  # ETH eq. 3.86; geometric Jacobian is assumed
                 task_wrench_motion = (arm_mass_matrix_task @ task_wrench_motion.unsqueeze(-1)).squeeze(-1)
 
-            task_wrench = task_wrench + torch.tensor(cfg_ctrl['motion_ctrl_axes'], device=device).unsqueeze(0) * task_wrench_motion
+            task_wrench = task_wrench + torch.as_tensor(cfg_ctrl['motion_ctrl_axes'], device=device, dtype=torch.float32).unsqueeze(0) * task_wrench_motion
 
         if cfg_ctrl['do_force_ctrl']:
             # Set tau = tau + F_t, where F_t is the target contact wrench
@@ -196,8 +197,8 @@ def compute_dof_torque(cfg_ctrl,
                 task_wrench_force = task_wrench_force + cfg_ctrl['wrench_prop_gains'] * torch.cat(
                     (force_error, torque_error), dim=1)  # part of Modern Robotics eq. 11.61
 
-            task_wrench = task_wrench + torch.tensor(cfg_ctrl['force_ctrl_axes'], device=device).unsqueeze(
-                0) * task_wrench_force
+            task_wrench = task_wrench + torch.as_tensor(cfg_ctrl['force_ctrl_axes'], device=device,
+                                                        dtype=torch.float32).unsqueeze(0) * task_wrench_force
 
         # Set tau = J^T * tau, i.e., map tau into joint space as desired
         jacobian_T = torch.transpose(jacobian, dim0=1, dim1=2)
@@ -295,31 +296,26 @@ def _get_delta_dof_pos(delta_pose, ik_method, jacobian, device):
         S_inv = 1. / S
         min_singular_value = 1.0e-5
         S_inv = torch.where(S > min_singular_value, S_inv, torch.zeros_like(S_inv))
-        jacobian_pinv = torch.transpose(Vh, dim0=1, dim1=2)[:, :, :6] @ torch.diag_embed(S_inv) @ torch.transpose(U, dim0=1, dim1=2)
+        # V @ diag(S_inv) is a column scaling of V; broadcast instead of building the diagonal matrix
+        jacobian_pinv = (torch.transpose(Vh, dim0=1, dim1=2)[:, :, :6] * S_inv.unsqueeze(1)) @ torch.transpose(U, dim0=1, dim1=2)
         delta_dof_pos = k_val * jacobian_pinv @ delta_pose.unsqueeze(-1)
         delta_dof_pos = delta_dof_pos.squeeze(-1)
 
     return delta_dof_pos
 
 
+@torch.jit.script
 def _apply_task_space_gains(delta_fingertip_pose,
                             fingertip_midpoint_linvel,
                             fingertip_midpoint_angvel,
                             task_prop_gains,
                             task_deriv_gains):
     """Interpret PD gains as task-space gains. Apply to task-space error."""
+    # NOTE: Scripted and written as one expression over all 6 components (lin: 0-2, rot: 3-5) so that the gain
+    # products fuse on the per-step control path
 
-    task_wrench = torch.zeros_like(delta_fingertip_pose)
-
-    # Apply gains to lin error components
-    lin_error = delta_fingertip_pose[:, 0:3]
-    task_wrench[:, 0:3] = task_prop_gains[:, 0:3] * lin_error + \
-                          task_deriv_gains[:, 0:3] * (0.0 - fingertip_midpoint_linvel)
-
-    # Apply gains to rot error components
-    rot_error = delta_fingertip_pose[:, 3:6]
-    task_wrench[:, 3:6] = task_prop_gains[:, 3:6] * rot_error + \
-                          task_deriv_gains[:, 3:6] * (0.0 - fingertip_midpoint_angvel)
+    fingertip_midpoint_vel = torch.cat((fingertip_midpoint_linvel, fingertip_midpoint_angvel), dim=1)
+    task_wrench = task_prop_gains * delta_fingertip_pose + task_deriv_gains * (0.0 - fingertip_midpoint_vel)
 
     return task_wrench
 
@@ -390,6 +386,46 @@ def translate_along_local_z(pos, quat, offset, device):
     return translated_pos
 
 
+@torch.jit.script
+def get_fingertip_midpoint_state(left_finger_pos,
+                                 right_finger_pos,
+                                 hand_quat,
+                                 fingertip_centered_pos,
+                                 fingertip_centered_linvel,
+                                 fingertip_centered_angvel,
+                                 finger_offset,
+                                 fingertip_midpoint_linvel: Optional[torch.Tensor] = None,
+                                 offset_buf: Optional[torch.Tensor] = None):
+    """Compute finger midpoint pos, fingertip midpoint pos, and fingertip midpoint linvel in a single fused call."""
+    # NOTE: Equivalent to translate_along_local_z followed by the rigid-body velocity transfer; scripted to reduce
+    # per-step kernel launches. finger_offset is the finger length along local Z, shape (num_vecs, 3), built once by
+    # the caller. If fingertip_midpoint_linvel is given, linvel is written into it in place; if offset_buf is given, it
+    # is used as scratch for the fingertip-midpoint-to-centered offset.
+
+    finger_midpoint_pos = (left_finger_pos + right_finger_pos) * 0.5
+
+    fingertip_midpoint_pos = finger_midpoint_pos + torch_utils.quat_apply(hand_quat, finger_offset)
+
+    # Cross product written out per component so that it fuses with the surrounding pointwise ops
+    wx, wy, wz = fingertip_centered_angvel.unbind(-1)
+    if offset_buf is None:
+        offset = fingertip_midpoint_pos - fingertip_centered_pos
+    else:
+        offset = offset_buf
+        torch.sub(fingertip_midpoint_pos, fingertip_centered_pos, out=offset)
+    dx, dy, dz = offset.unbind(-1)
+    linvel_offset = torch.stack((wy * dz - wz * dy,
+                                 wz * dx - wx * dz,
+                                 wx * dy - wy * dx), dim=-1)
+    if fingertip_midpoint_linvel is None:
+        linvel = fingertip_centered_linvel + linvel_offset
+    else:
+        linvel = fingertip_midpoint_linvel
+        torch.add(fingertip_centered_linvel, linvel_offset, out=linvel)
+
+    return finger_midpoint_pos, fingertip_midpoint_pos, linvel
+
+
 def axis_angle_from_euler(euler):
     """Convert tensor of Euler angles to tensor of axis-angles."""
 
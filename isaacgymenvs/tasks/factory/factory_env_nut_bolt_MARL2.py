@@ -38,6 +38,7 @@ import numpy as np
 import os
 import torch
 
+from gym import logger
 from isaacgym import gymapi
 from isaacgymenvs.tasks.factory.factory_base_MARL2 import FactoryBase_MARL2
 import isaacgymenvs.tasks.factory.factory_control as fc
@@ -322,7 +323,7 @@ class FactoryEnvNutBolt_MARL2(FactoryBase_MARL2, FactoryABCEnv):
         self.second_franka_actor_ids_sim = torch.tensor(self.second_franka_actor_ids_sim, dtype=torch.int32, device=self.device)
         self.nut_actor_ids_sim = torch.tensor(self.nut_actor_ids_sim, dtype=torch.int32, device=self.device)
         self.bolt_actor_ids_sim = torch.tensor(self.bolt_actor_ids_sim, dtype=torch.int32, device=self.device)
-        print ("self.franka_actor_ids_sim ", self.franka_actor_ids_sim)
+        logger.debug("self.franka_actor_ids_sim %s", self.franka_actor_ids_sim)
         # For extracting root pos/quat
         self.nut_actor_id_env = self.gym.find_actor_index(env_ptr, 'nut', gymapi.DOMAIN_ENV)
         self.bolt_actor_id_env = self.gym.find_actor_index(env_ptr, 'bolt', gymapi.DOMAIN_ENV)
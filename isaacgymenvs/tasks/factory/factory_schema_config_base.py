@@ -38,6 +38,7 @@ from dataclasses import dataclass
 class Mode:
     export_scene: bool  # export scene to USD
     export_states: bool  # export states to NPY
+    verbose_shapes: bool = False  # log acquired tensor shapes and body indices at init (debug level)
 
 
 @dataclass
@@ -32,6 +32,7 @@ Inherits nut-bolt environment class and abstract task class (not enforced). Can
 python train.py task=FactoryTaskNutBoltPick_MARL2
 """
 
+import copy
 import hydra
 import omegaconf
 import os
@@ -45,6 +46,10 @@ from isaacgymenvs.tasks.factory.factory_schema_config_task import FactorySchemaC
 from isaacgymenvs.utils import torch_jit_utils
 
 
+# Composed task-side configs, keyed by (asset_info_path, ppo_path); shared across instances
+_yaml_cache = {}
+
+
 class FactoryTaskNutBoltPick_MARL2(FactoryEnvNutBolt_MARL2, FactoryABCTask):
 
     def __init__(self, cfg, rl_device, sim_device, graphics_device_id, headless, virtual_screen_capture, force_render):
@@ -57,29 +62,47 @@ class FactoryTaskNutBoltPick_MARL2(FactoryEnvNutBolt_MARL2, FactoryABCTask):
         self._acquire_task_tensors()
         self.parse_controller_spec()
 
+        # Per-step config flags as plain Python values, so the action path skips OmegaConf lookups
+        self._clamp_rot = bool(self.cfg_task.rl.clamp_rot)
+        self._clamp_rot_thresh = float(self.cfg_task.rl.clamp_rot_thresh)
+        self._do_force_ctrl = bool(self.cfg_ctrl['do_force_ctrl'])
+
+        # Host-side mirror of progress_buf; episode length is constant across envs, so one counter suffices
+        self._step_in_episode = 0
+
         if self.cfg_task.sim.disable_gravity:
             self.disable_gravity()
 
-        if self.viewer is not None:
+        # render() only does work with a viewer; checked once so headless sim loops skip the call entirely
+        self._has_viewer = self.viewer is not None
+        if self._has_viewer:
             self._set_viewer_params()
 
     def _get_task_yaml_params(self):
         """Initialize instance variables from YAML files."""
 
-        cs = hydra.core.config_store.ConfigStore.instance()
-        cs.store(name='factory_schema_config_task', node=FactorySchemaConfigTask)
-
         self.cfg_task = omegaconf.OmegaConf.create(self.cfg)
         self.max_episode_length = self.cfg_task.rl.max_episode_length  # required instance var for VecTask
 
         asset_info_path = os.path.join('..', '..', 'assets', 'factory', 'yaml',
                                        'factory_asset_info_nut_bolt.yaml')  # relative to Gym's Hydra search path (cfg dir)
-        self.asset_info_insertion = hydra.compose(config_name=asset_info_path)
-        self.asset_info_insertion = self.asset_info_insertion['']['']['']['']['']['']['assets']['factory']['yaml']  # strip superfluous nesting
-
         ppo_path = os.path.join('train/FactoryTaskNutBoltPick_MARL2PPO.yaml')  # relative to Gym's Hydra search path (cfg dir)
-        self.cfg_ppo = hydra.compose(config_name=ppo_path)
-        self.cfg_ppo = self.cfg_ppo['train']  # strip superfluous nesting
+
+        key = (asset_info_path, ppo_path)
+        if key not in _yaml_cache:
+            cs = hydra.core.config_store.ConfigStore.instance()
+            cs.store(name='factory_schema_config_task', node=FactorySchemaConfigTask)
+
+            asset_info_insertion = hydra.compose(config_name=asset_info_path)
+            asset_info_insertion = asset_info_insertion['']['']['']['']['']['']['assets']['factory']['yaml']  # strip superfluous nesting
+
+            cfg_ppo = hydra.compose(config_name=ppo_path)
+            cfg_ppo = cfg_ppo['train']  # strip superfluous nesting
+
+            _yaml_cache[key] = (asset_info_insertion, cfg_ppo)
+
+        # Deep copy so that per-instance modifications do not leak into the cache
+        self.asset_info_insertion, self.cfg_ppo = copy.deepcopy(_yaml_cache[key])
 
     def _acquire_task_tensors(self):
         """Acquire tensors."""
@@ -88,8 +111,8 @@ class FactoryTaskNutBoltPick_MARL2(FactoryEnvNutBolt_MARL2, FactoryABCTask):
         nut_grasp_heights = self.bolt_head_heights + self.nut_heights * 0.5  # nut COM
         self.nut_grasp_pos_local = nut_grasp_heights * torch.tensor([0.0, 0.0, 1.0], device=self.device).repeat(
             (self.num_envs, 1))
-        self.nut_grasp_quat_local = torch.tensor([0.0, 1.0, 0.0, 0.0], device=self.device).unsqueeze(0).repeat(
-            self.num_envs, 1)
+        self.nut_grasp_quat_local = torch.tensor([0.0, 1.0, 0.0, 0.0], device=self.device).unsqueeze(0).expand(
+            self.num_envs, -1)  # constant rows; read-only, so storage is shared
 
         # Keypoint tensors
         self.keypoint_offsets = self._get_keypoint_offsets(
@@ -99,15 +122,12 @@ class FactoryTaskNutBoltPick_MARL2(FactoryEnvNutBolt_MARL2, FactoryABCTask):
                                              device=self.device)
         self.keypoints_nut = torch.zeros_like(self.keypoints_gripper, device=self.device)
 
-        self.identity_quat = torch.tensor([0.0, 0.0, 0.0, 1.0], device=self.device).unsqueeze(0).repeat(self.num_envs,
-                                                                                                        1)
-
         # Grasp pose tensors (Bolt)
         bolt_grasp_heights = self.bolt_head_heights + self.nut_heights * 0.5 
         self.bolt_grasp_pos_local = bolt_grasp_heights * torch.tensor([0.0, 0.0, 1.0], device=self.device).repeat(
             (self.num_envs, 1))
-        self.bolt_grasp_quat_local = torch.tensor([0.0, 1.0, 0.0, 0.0], device=self.device).unsqueeze(0).repeat(
-            self.num_envs, 1)
+        self.bolt_grasp_quat_local = torch.tensor([0.0, 1.0, 0.0, 0.0], device=self.device).unsqueeze(0).expand(
+            self.num_envs, -1)  # constant rows; read-only, so storage is shared
         
         # Keypoint tensors
         self.second_keypoint_offsets = self._get_keypoint_offsets(
@@ -117,45 +137,99 @@ class FactoryTaskNutBoltPick_MARL2(FactoryEnvNutBolt_MARL2, FactoryABCTask):
                                                 device=self.device)
         self.keypoints_bolt = torch.zeros_like(self.second_keypoints_gripper, device=self.device)
 
-        self.second_identity_quat = torch.tensor([0.0, 0.0, 0.0, 1.0], device=self.device).unsqueeze(0).repeat(self.num_envs,
-                                                                                                        1)
+        # Both Frankas batched along the env dim: rows [0, num_envs) are Franka 1 / nut, [num_envs, 2 * num_envs)
+        # are Franka 2 / bolt
+        # Materialized, since quat_mul reshapes its inputs and would otherwise copy the expanded view every step
+        self._obj_grasp_quat_local = torch.cat((self.nut_grasp_quat_local, self.bolt_grasp_quat_local), dim=0)
+        self._obj_grasp_pos_local = torch.cat((self.nut_grasp_pos_local, self.bolt_grasp_pos_local), dim=0)
+        self._keypoint_offsets_2b = torch.cat(
+            (self.keypoint_offsets.unsqueeze(0).expand(self.num_envs, -1, -1),
+             self.second_keypoint_offsets.unsqueeze(0).expand(self.num_envs, -1, -1)), dim=0)
+        self._keypoints_gripper_2b = torch.cat((self.keypoints_gripper, self.second_keypoints_gripper), dim=0)
+        self._keypoints_obj_2b = torch.cat((self.keypoints_nut, self.keypoints_bolt), dim=0)
+
+        # Action and noise scales (per-axis; multiplying by these equals multiplying by their diag matrix)
+        self._pos_scale = torch.tensor(self.cfg_task.rl.pos_action_scale, device=self.device)
+        self._rot_scale = torch.tensor(self.cfg_task.rl.rot_action_scale, device=self.device)
+        self._force_scale = torch.tensor(self.cfg_task.rl.force_action_scale, device=self.device)
+        self._torque_scale = torch.tensor(self.cfg_task.rl.torque_action_scale, device=self.device)
+        self._nut_pos_noise_scale = torch.tensor(self.cfg_task.randomize.nut_pos_xy_initial_noise, device=self.device)
+        self._bolt_pos_noise_scale = torch.tensor(self.cfg_task.randomize.bolt_pos_xy_noise, device=self.device)
+        self._fingertip_pos_noise_scale = torch.tensor(self.cfg_task.randomize.fingertip_midpoint_pos_noise,
+                                                       device=self.device)
+        self._fingertip_rot_noise_scale = torch.tensor(self.cfg_task.randomize.fingertip_midpoint_rot_noise,
+                                                       device=self.device)
+
+        # Initial fingertip pose targets, shared by both Frankas
+        self._fingertip_pos_init = torch.tensor([0.0, 0.0, self.cfg_base.env.table_height], device=self.device) \
+                                   + torch.tensor(self.cfg_task.randomize.fingertip_midpoint_pos_initial, device=self.device)
+        self._fingertip_rot_init = torch.tensor(self.cfg_task.randomize.fingertip_midpoint_rot_initial, device=self.device)
+
+        self._identity_quat = torch.tensor([0.0, 0.0, 0.0, 1.0], device=self.device)
+
+        # Open-gripper target as a 0-d device tensor; the controller expands it without a host-to-device copy
+        self._gripper_width_max = torch.as_tensor(self.asset_info_franka_table.franka_gripper_width_max,
+                                                  dtype=torch.float32, device=self.device)
+
+        # Reset noise, sampled in [-1, 1] and scaled in place once per reset; columns = nut xy (0:2), bolt xy (2:4),
+        # fingertip pos of both Frankas (4:7, 7:10), fingertip rot of both Frankas (10:13, 13:16)
+        self._reset_noise_buf = torch.empty((self.num_envs, 16), device=self.device)
+        self._reset_noise_scale = torch.cat((self._nut_pos_noise_scale,
+                                             self._bolt_pos_noise_scale,
+                                             self._fingertip_pos_noise_scale.repeat(2),
+                                             self._fingertip_rot_noise_scale.repeat(2)))
+
+        # Actions used to servo both grippers to their random pose on reset; only the pose error slices
+        # (0:6 and 12:18) are written, the force/torque slices stay zero
+        self._reset_actions = torch.zeros((self.num_envs, self.cfg_task.env.numActions), device=self.device)
+        # Per-Franka view of the same storage (num_envs, 2, 12), matching the split in _apply_actions_as_ctrl_targets
+        self._reset_actions_2b = self._reset_actions.view(self.num_envs, 2, -1)
+        # All-zero actions (no hand motion) for gripper-only moves; never written
+        self._zero_actions = torch.zeros_like(self._reset_actions)
+
+        # Actor ids stacked as (2, num_envs), so a reset gathers both robots (or nut and bolt) in one index;
+        # flattening [:, env_ids] keeps the setter order (first arm / nut, then second arm / bolt)
+        self._both_franka_actor_ids_sim = torch.stack((self.franka_actor_ids_sim, self.second_franka_actor_ids_sim),
+                                                      dim=0)
+        self._nut_bolt_actor_ids_sim = torch.stack((self.nut_actor_ids_sim, self.bolt_actor_ids_sim), dim=0)
+        # Persistent int32 buffers the reset setters read their ids from
+        self._franka_ids_buf = torch.empty(2 * self.num_envs, dtype=torch.int32, device=self.device)
+        self._nut_bolt_ids_buf = torch.empty(2 * self.num_envs, dtype=torch.int32, device=self.device)
+
+        # Gym views of the state tensors passed to the reset setters; the wrapped storage never moves
+        self._dof_state_gym = gymtorch.unwrap_tensor(self.dof_state)
+        self._root_state_gym = gymtorch.unwrap_tensor(self.root_state)
+
+        # Reward scales as Python floats for the scripted reward
+        self._kp_scale = float(self.cfg_task.rl.keypoint_reward_scale)
+        self._ap_scale = float(self.cfg_task.rl.action_penalty_scale)
+
+        # Initial DOF pos of both Frankas (arm + 2 gripper DOFs each); shape = (num_dofs,)
+        franka_initial_dof_pos = torch.cat(
+            (torch.tensor(self.cfg_task.randomize.franka_arm_initial_dof_pos, device=self.device),
+             torch.tensor([self.asset_info_franka_table.franka_gripper_width_max] * 2, device=self.device)))
+        self._dof_pos_template = franka_initial_dof_pos.repeat(2)
 
     def _refresh_task_tensors(self):
         """Refresh tensors."""
 
-        # Compute pose of nut grasping frame
-        self.nut_grasp_quat, self.nut_grasp_pos = torch_jit_utils.tf_combine(self.nut_quat,
-                                                                             self.nut_pos,
-                                                                             self.nut_grasp_quat_local,
-                                                                             self.nut_grasp_pos_local)
-
-        # Compute pos of keypoints on gripper and nut in world frame        
-        for idx, keypoint_offset in enumerate(self.keypoint_offsets):
-            self.keypoints_gripper[:, idx] = torch_jit_utils.tf_combine(self.fingertip_midpoint_quat,
-                                                                        self.fingertip_midpoint_pos,
-                                                                        self.identity_quat,
-                                                                        keypoint_offset.repeat(self.num_envs, 1))[1]
-            self.keypoints_nut[:, idx] = torch_jit_utils.tf_combine(self.nut_grasp_quat,
-                                                                    self.nut_grasp_pos,
-                                                                    self.identity_quat,
-                                                                    keypoint_offset.repeat(self.num_envs, 1))[1]
-            
-        # Compute pose of bolt grasping frame
-        self.bolt_grasp_quat, self.bolt_grasp_pos = torch_jit_utils.tf_combine(self.bolt_quat,
-                                                                                self.bolt_pos,
-                                                                                self.bolt_grasp_quat_local,
-                                                                                self.bolt_grasp_pos_local)
-        
-        # Compute pos of keypoints on gripper and bolt in world frame
-        for idx, second_keypoint_offset in enumerate(self.second_keypoint_offsets):
-            self.second_keypoints_gripper[:, idx] = torch_jit_utils.tf_combine(self.second_fingertip_midpoint_quat,
-                                                                                self.second_fingertip_midpoint_pos,
-                                                                                self.second_identity_quat,
-                                                                                second_keypoint_offset.repeat(self.num_envs, 1))[1]
-            self.keypoints_bolt[:, idx] = torch_jit_utils.tf_combine(self.bolt_grasp_quat,
-                                                                        self.bolt_grasp_pos,
-                                                                        self.second_identity_quat,
-                                                                        second_keypoint_offset.repeat(self.num_envs, 1))[1]
+        # Compute pose of nut/bolt grasping frames and pos of keypoints on grippers and nut/bolt in world frame,
+        # for both Frankas in one batch (Franka 1 / nut first, Franka 2 / bolt second)
+        obj_grasp_quat, obj_grasp_pos, self._keypoints_gripper_2b, self._keypoints_obj_2b = \
+            compute_grasp_and_keypoints(torch.cat((self.nut_quat, self.bolt_quat), dim=0),
+                                        torch.cat((self.nut_pos, self.bolt_pos), dim=0),
+                                        self._obj_grasp_quat_local,
+                                        self._obj_grasp_pos_local,
+                                        torch.cat((self.fingertip_midpoint_quat,
+                                                   self.second_fingertip_midpoint_quat), dim=0),
+                                        torch.cat((self.fingertip_midpoint_pos,
+                                                   self.second_fingertip_midpoint_pos), dim=0),
+                                        self._keypoint_offsets_2b)
+
+        self.nut_grasp_quat, self.bolt_grasp_quat = obj_grasp_quat.chunk(2, dim=0)
+        self.nut_grasp_pos, self.bolt_grasp_pos = obj_grasp_pos.chunk(2, dim=0)
+        self.keypoints_gripper, self.second_keypoints_gripper = self._keypoints_gripper_2b.chunk(2, dim=0)
+        self.keypoints_nut, self.keypoints_bolt = self._keypoints_obj_2b.chunk(2, dim=0)
 
     def pre_physics_step(self, actions):
         """Reset environments. Apply actions from policy. Simulation step called after this method."""
@@ -164,19 +238,21 @@ class FactoryTaskNutBoltPick_MARL2(FactoryEnvNutBolt_MARL2, FactoryABCTask):
         if len(env_ids) > 0:
             self.reset_idx(env_ids)
 
-        self.actions = actions.clone().to(self.device)  # shape = (num_envs, num_actions); values = [-1, 1]
+        # VecTask.step passes a freshly clamped tensor, so no defensive clone; .to() is a no-op when already on device
+        self.actions = actions.to(self.device, non_blocking=True)  # shape = (num_envs, num_actions); values = [-1, 1]
 
         self._apply_actions_as_ctrl_targets(actions=self.actions,
-                                            ctrl_target_gripper_dof_pos=self.asset_info_franka_table.franka_gripper_width_max,
+                                            ctrl_target_gripper_dof_pos=self._gripper_width_max,
                                             do_scale=True)
 
     def post_physics_step(self):
         """Step buffers. Refresh tensors. Compute observations and reward. Reset environments."""
 
         self.progress_buf[:] += 1
+        self._step_in_episode += 1
 
         # In this policy, episode length is constant
-        is_last_step = (self.progress_buf[0] == self.max_episode_length - 1)
+        is_last_step = (self._step_in_episode == self.max_episode_length - 1)
 
         if self.cfg_task.env.close_and_lift:
             # At this point, robot has executed RL policy. Now close gripper and lift (open-loop)
@@ -222,37 +298,20 @@ class FactoryTaskNutBoltPick_MARL2(FactoryEnvNutBolt_MARL2, FactoryABCTask):
         """Assign environments for reset if successful or failed."""
 
         # If max episode length has been reached
-        self.reset_buf[:] = torch.where(self.progress_buf[:] >= self.max_episode_length - 1,
-                                        torch.ones_like(self.reset_buf),
-                                        self.reset_buf)
+        self.reset_buf.bitwise_or_((self.progress_buf >= self.max_episode_length - 1).to(self.reset_buf.dtype))
 
     def _update_rew_buf(self):
         """Compute reward at current timestep."""
 
-        Franka_1_action = self.actions[:, :12]
-        Franka_2_action = self.actions[:, 12:]
-
-        keypoint_reward = -self._get_keypoint_dist()
-        action_penalty = torch.norm(Franka_1_action, p=2, dim=-1) * self.cfg_task.rl.action_penalty_scale
-
-        # reward for bolt picking     
-        second_keypoint_reward = -self._second_get_keypoint_dist()
-        second_action_penalty = torch.norm(Franka_2_action, p=2, dim=-1) * self.cfg_task.rl.action_penalty_scale
-
-        # print("keypoint_reward: ", keypoint_reward)
-        # print("second_keypoint_reward: ", second_keypoint_reward)
-
-        # print("action_penalty: ", action_penalty)
-        # print("second_action_penalty: ", second_action_penalty)
-
-        # Added two Pandas rewards together
-        self.rew_buf[:] = (keypoint_reward * self.cfg_task.rl.keypoint_reward_scale \
-                          - action_penalty * self.cfg_task.rl.action_penalty_scale) \
-                          + (second_keypoint_reward * self.cfg_task.rl.keypoint_reward_scale \
-                    - second_action_penalty * self.cfg_task.rl.action_penalty_scale)
+        # Both Pandas' rewards added together
+        self.rew_buf[:] = compute_keypoint_reward(self._keypoints_obj_2b,
+                                                  self._keypoints_gripper_2b,
+                                                  self.actions,
+                                                  self._kp_scale,
+                                                  self._ap_scale)
 
         # In this policy, episode length is constant across all envs
-        is_last_step = (self.progress_buf[0] == self.max_episode_length - 1)
+        is_last_step = (self._step_in_episode == self.max_episode_length - 1)
 
         if is_last_step:
             # Check if nut is picked up and above table
@@ -263,6 +322,8 @@ class FactoryTaskNutBoltPick_MARL2(FactoryEnvNutBolt_MARL2, FactoryABCTask):
     def reset_idx(self, env_ids):
         """Reset specified environments."""
 
+        self._reset_noise_buf.uniform_(-1.0, 1.0).mul_(self._reset_noise_scale)
+
         self._reset_franka(env_ids)
         self._reset_object(env_ids)
 
@@ -273,25 +334,15 @@ class FactoryTaskNutBoltPick_MARL2(FactoryEnvNutBolt_MARL2, FactoryABCTask):
     def _reset_franka(self, env_ids):
         """Reset DOF states and DOF targets of Franka."""
 
-        self.dof_pos[env_ids] = torch.cat(
-            (torch.tensor(self.cfg_task.randomize.franka_arm_initial_dof_pos, device=self.device),
-             torch.tensor([self.asset_info_franka_table.franka_gripper_width_max], device=self.device),
-             torch.tensor([self.asset_info_franka_table.franka_gripper_width_max], device=self.device),
-             torch.tensor(self.cfg_task.randomize.franka_arm_initial_dof_pos, device=self.device),
-             torch.tensor([self.asset_info_franka_table.franka_gripper_width_max], device=self.device),
-             torch.tensor([self.asset_info_franka_table.franka_gripper_width_max], device=self.device)  
-             ),
-            dim=-1).unsqueeze(0).repeat((self.num_envs, 1))  # shape = (num_envs, num_dofs)
+        self.dof_pos[env_ids] = self._dof_pos_template  # broadcast over env_ids; shape = (num_envs, num_dofs)
         self.dof_vel[env_ids] = 0.0  # shape = (num_envs, num_dofs)
-        self.ctrl_target_dof_pos[env_ids] = self.dof_pos[env_ids]
+        self.ctrl_target_dof_pos[env_ids] = self._dof_pos_template
 
-        multi_env_ids_int32 = self.franka_actor_ids_sim[env_ids].flatten()
-        second_multi_env_ids_int32 = self.second_franka_actor_ids_sim[env_ids].flatten()
-        multi_env_ids_int32 = torch.cat((multi_env_ids_int32, second_multi_env_ids_int32)).flatten()
+        multi_env_ids_int32 = self._gather_actor_ids(self._both_franka_actor_ids_sim, self._franka_ids_buf, env_ids)
         self.gym.set_dof_state_tensor_indexed(self.sim,
-                                              gymtorch.unwrap_tensor(self.dof_state),
+                                              self._dof_state_gym,
                                               gymtorch.unwrap_tensor(multi_env_ids_int32),
-                                              len(multi_env_ids_int32))
+                                              multi_env_ids_int32.numel())
 
     def _reset_object(self, env_ids):
         """Reset root states of nut and bolt."""
@@ -302,49 +353,55 @@ class FactoryTaskNutBoltPick_MARL2(FactoryEnvNutBolt_MARL2, FactoryABCTask):
         # shape of root_angvel = (num_envs, num_actors, 3)
 
         # Randomize root state of nut
-        nut_noise_xy = 2 * (torch.rand((self.num_envs, 2), dtype=torch.float32, device=self.device) - 0.5)  # [-1, 1]
-        nut_noise_xy = nut_noise_xy @ torch.diag(
-            torch.tensor(self.cfg_task.randomize.nut_pos_xy_initial_noise, device=self.device))
+        nut_noise_xy = self._reset_noise_buf[:, 0:2]
         self.root_pos[env_ids, self.nut_actor_id_env, 0] = self.cfg_task.randomize.nut_pos_xy_initial[0] + nut_noise_xy[
             env_ids, 0]
         self.root_pos[env_ids, self.nut_actor_id_env, 1] = self.cfg_task.randomize.nut_pos_xy_initial[1] + nut_noise_xy[
             env_ids, 1]
         self.root_pos[
             env_ids, self.nut_actor_id_env, 2] = self.cfg_base.env.table_height - self.bolt_head_heights.squeeze(-1)
-        self.root_quat[env_ids, self.nut_actor_id_env] = torch.tensor([0.0, 0.0, 0.0, 1.0], dtype=torch.float32,
-                                                                      device=self.device).repeat(len(env_ids), 1)
+        self.root_quat[env_ids, self.nut_actor_id_env] = self._identity_quat
 
         self.root_linvel[env_ids, self.nut_actor_id_env] = 0.0
         self.root_angvel[env_ids, self.nut_actor_id_env] = 0.0
 
         # Randomize root state of bolt
-        bolt_noise_xy = 2 * (torch.rand((self.num_envs, 2), dtype=torch.float32, device=self.device) - 0.5)  # [-1, 1]
-        bolt_noise_xy = bolt_noise_xy @ torch.diag(
-            torch.tensor(self.cfg_task.randomize.bolt_pos_xy_noise, device=self.device))
+        bolt_noise_xy = self._reset_noise_buf[:, 2:4]
         self.root_pos[env_ids, self.bolt_actor_id_env, 0] = self.cfg_task.randomize.bolt_pos_xy_initial[0] + \
                                                             bolt_noise_xy[env_ids, 0]
         self.root_pos[env_ids, self.bolt_actor_id_env, 1] = self.cfg_task.randomize.bolt_pos_xy_initial[1] + \
                                                             bolt_noise_xy[env_ids, 1]
         self.root_pos[env_ids, self.bolt_actor_id_env, 2] = self.cfg_base.env.table_height
-        self.root_quat[env_ids, self.bolt_actor_id_env] = torch.tensor([0.0, 0.0, 0.0, 1.0], dtype=torch.float32,
-                                                                       device=self.device).repeat(len(env_ids), 1)
+        self.root_quat[env_ids, self.bolt_actor_id_env] = self._identity_quat
 
         self.root_linvel[env_ids, self.bolt_actor_id_env] = 0.0
         self.root_angvel[env_ids, self.bolt_actor_id_env] = 0.0
 
-        nut_bolt_actor_ids_sim = torch.cat((self.nut_actor_ids_sim[env_ids],
-                                            self.bolt_actor_ids_sim[env_ids]),
-                                           dim=0)
+        nut_bolt_actor_ids_sim = self._gather_actor_ids(self._nut_bolt_actor_ids_sim, self._nut_bolt_ids_buf, env_ids)
         self.gym.set_actor_root_state_tensor_indexed(self.sim,
-                                                     gymtorch.unwrap_tensor(self.root_state),
+                                                     self._root_state_gym,
                                                      gymtorch.unwrap_tensor(nut_bolt_actor_ids_sim),
-                                                     len(nut_bolt_actor_ids_sim))
+                                                     nut_bolt_actor_ids_sim.numel())
+
+    def _gather_actor_ids(self, actor_ids_sim, ids_buf, env_ids):
+        """Gather (2, num_envs) actor ids of env_ids into a persistent buffer. Return the filled flat slice."""
+
+        num_ids = env_ids.numel()
+        if num_ids == self.num_envs:
+            # env_ids come sorted and unique from reset_buf.nonzero(), so a full reset is the whole table
+            return actor_ids_sim.view(-1)
+
+        actor_ids = ids_buf[:2 * num_ids]
+        torch.index_select(actor_ids_sim, 1, env_ids, out=actor_ids.view(2, num_ids))
+
+        return actor_ids
 
     def _reset_buffers(self, env_ids):
         """Reset buffers."""
 
         self.reset_buf[env_ids] = 0
         self.progress_buf[env_ids] = 0
+        self._step_in_episode = 0
 
     def _set_viewer_params(self):
         """Set viewer parameters."""
@@ -356,71 +413,44 @@ class FactoryTaskNutBoltPick_MARL2(FactoryEnvNutBolt_MARL2, FactoryABCTask):
     def _apply_actions_as_ctrl_targets(self, actions, ctrl_target_gripper_dof_pos, do_scale):
         """Apply actions from policy as position/rotation targets."""
 
-        # Interpret actions as target pos displacements and set pos target
-        pos_actions = actions[:, 0:3]        
-        if do_scale:
-            pos_actions = pos_actions @ torch.diag(torch.tensor(self.cfg_task.rl.pos_action_scale, device=self.device))
-        self.ctrl_target_fingertip_midpoint_pos = self.fingertip_midpoint_pos + pos_actions        
+        # Actions of both Frankas along an arm axis; shape = (num_envs, 2, num_actions_per_franka)
+        actions = actions.view(self.num_envs, 2, -1)
 
-        second_pos_actions = actions[:, 12:15]
+        # Interpret actions as target pos displacements and set pos target
+        pos_actions = actions[..., 0:3]
         if do_scale:
-            second_pos_actions = second_pos_actions @ torch.diag(torch.tensor(self.cfg_task.rl.pos_action_scale, device=self.device))
-        self.second_ctrl_target_fingertip_midpoint_pos = self.second_fingertip_midpoint_pos + second_pos_actions  
+            pos_actions = pos_actions * self._pos_scale
+        fingertip_midpoint_pos = torch.stack((self.fingertip_midpoint_pos, self.second_fingertip_midpoint_pos), dim=1)
+        self.ctrl_target_fingertip_midpoint_pos, self.second_ctrl_target_fingertip_midpoint_pos = \
+            (fingertip_midpoint_pos + pos_actions).unbind(dim=1)
 
         # Interpret actions as target rot (axis-angle) displacements
-        rot_actions = actions[:, 3:6]
-        if do_scale:
-            rot_actions = rot_actions @ torch.diag(torch.tensor(self.cfg_task.rl.rot_action_scale, device=self.device))
-
-        second_rot_actions = actions[:, 15:18]
+        rot_actions = actions[..., 3:6]
         if do_scale:
-            second_rot_actions = second_rot_actions @ torch.diag(torch.tensor(self.cfg_task.rl.rot_action_scale, device=self.device))
+            rot_actions = rot_actions * self._rot_scale
 
         # Convert to quat and set rot target
-        angle = torch.norm(rot_actions, p=2, dim=-1)
-        axis = rot_actions / angle.unsqueeze(-1)
-        rot_actions_quat = torch_utils.quat_from_angle_axis(angle, axis)
-        if self.cfg_task.rl.clamp_rot:
-            rot_actions_quat = torch.where(angle.unsqueeze(-1).repeat(1, 4) > self.cfg_task.rl.clamp_rot_thresh,
-                                           rot_actions_quat,
-                                           torch.tensor([0.0, 0.0, 0.0, 1.0], device=self.device).repeat(self.num_envs,
-                                                                                                         1))
-        self.ctrl_target_fingertip_midpoint_quat = torch_utils.quat_mul(rot_actions_quat, self.fingertip_midpoint_quat)
-
-        second_angle = torch.norm(second_rot_actions, p=2, dim=-1)
-        second_axis = second_rot_actions / second_angle.unsqueeze(-1)
-        second_rot_actions_quat = torch_utils.quat_from_angle_axis(second_angle, second_axis)
-        if self.cfg_task.rl.clamp_rot:
-            second_rot_actions_quat = torch.where(second_angle.unsqueeze(-1).repeat(1, 4) > self.cfg_task.rl.clamp_rot_thresh,
-                                           second_rot_actions_quat,
-                                           torch.tensor([0.0, 0.0, 0.0, 1.0], device=self.device).repeat(self.num_envs,
-                                                                                                         1))
-        self.second_ctrl_target_fingertip_midpoint_quat = torch_utils.quat_mul(second_rot_actions_quat, self.second_fingertip_midpoint_quat)
-
-
-
-        if self.cfg_ctrl['do_force_ctrl']:
+        rot_actions_quat = axis_angle_to_quat_clamped(rot_actions,
+                                                      self._identity_quat,
+                                                      self._clamp_rot,
+                                                      self._clamp_rot_thresh)
+        fingertip_midpoint_quat = torch.stack((self.fingertip_midpoint_quat, self.second_fingertip_midpoint_quat),
+                                              dim=1)
+        self.ctrl_target_fingertip_midpoint_quat, self.second_ctrl_target_fingertip_midpoint_quat = \
+            torch_utils.quat_mul(rot_actions_quat, fingertip_midpoint_quat).unbind(dim=1)
+
+        if self._do_force_ctrl:
             # Interpret actions as target forces and target torques
-            force_actions = actions[:, 6:9]
-            second_force_actions = actions[:, 18:21]
+            force_actions = actions[..., 6:9]
             if do_scale:
-                force_actions = force_actions @ torch.diag(
-                    torch.tensor(self.cfg_task.rl.force_action_scale, device=self.device))
-            if do_scale:
-                second_force_actions = second_force_actions @ torch.diag(
-                    torch.tensor(self.cfg_task.rl.force_action_scale, device=self.device))
+                force_actions = force_actions * self._force_scale
 
-            torque_actions = actions[:, 9:12]
-            second_torque_actions = actions[:, 21:24]
-            if do_scale:
-                torque_actions = torque_actions @ torch.diag(
-                    torch.tensor(self.cfg_task.rl.torque_action_scale, device=self.device))
+            torque_actions = actions[..., 9:12]
             if do_scale:
-                second_torque_actions = second_torque_actions @ torch.diag(
-                    torch.tensor(self.cfg_task.rl.torque_action_scale, device=self.device))
+                torque_actions = torque_actions * self._torque_scale
 
-            self.ctrl_target_fingertip_contact_wrench = torch.cat((force_actions, torque_actions), dim=-1)
-            self.second_ctrl_target_fingertip_contact_wrench = torch.cat((second_force_actions, second_torque_actions), dim=-1)
+            self.ctrl_target_fingertip_contact_wrench, self.second_ctrl_target_fingertip_contact_wrench = \
+                torch.cat((force_actions, torque_actions), dim=-1).unbind(dim=1)
 
         self.ctrl_target_gripper_dof_pos = ctrl_target_gripper_dof_pos
         self.second_ctrl_target_gripper_dof_pos = ctrl_target_gripper_dof_pos
@@ -436,21 +466,6 @@ class FactoryTaskNutBoltPick_MARL2(FactoryEnvNutBolt_MARL2, FactoryABCTask):
 
         return keypoint_offsets
 
-    def _get_keypoint_dist(self):
-        """Get keypoint distance."""
-        # TODO: get key_point_distance of the gripper (franka_2) and the bolt
-
-        keypoint_dist = torch.sum(torch.norm(self.keypoints_nut - self.keypoints_gripper, p=2, dim=-1), dim=-1)
-
-        return keypoint_dist
-    
-    def _second_get_keypoint_dist(self):
-        """Get keypoint distance of Franka_2."""
-
-        keypoint_dist = torch.sum(torch.norm(self.keypoints_bolt - self.second_keypoints_gripper, p=2, dim=-1), dim=-1)
-
-        return keypoint_dist
-
     def _close_gripper(self, sim_steps=20):
         """Fully close gripper using controller. Called outside RL loop (i.e., after last step of episode)."""
 
@@ -459,39 +474,36 @@ class FactoryTaskNutBoltPick_MARL2(FactoryEnvNutBolt_MARL2, FactoryABCTask):
     def _move_gripper_to_dof_pos(self, gripper_dof_pos, sim_steps=20):
         """Move gripper fingers to specified DOF position using controller."""
 
-        delta_hand_pose = torch.zeros((self.num_envs, self.cfg_task.env.numActions),
-                                      device=self.device)  # No hand motion
-        self._apply_actions_as_ctrl_targets(delta_hand_pose, gripper_dof_pos, do_scale=False)
+        self._apply_actions_as_ctrl_targets(self._zero_actions, gripper_dof_pos, do_scale=False)  # No hand motion
 
         # Step sim
         for _ in range(sim_steps):
-            self.render()
+            if self._has_viewer:
+                self.render()
             self.gym.simulate(self.sim)
 
     def _lift_gripper(self, franka_gripper_width=0.0, lift_distance=0.3, sim_steps=20):
         """Lift gripper by specified distance. Called outside RL loop (i.e., after last step of episode)."""
 
         delta_hand_pose = torch.zeros([self.num_envs, self.cfg_task.env.numActions], device=self.device)
-        delta_hand_pose[:, 2] = lift_distance
-        delta_hand_pose[:, 14] = lift_distance
-
+        delta_hand_pose.view(self.num_envs, 2, -1)[..., 2] = lift_distance  # z of both Frankas (cols 2 and 14)
+        # Tensors are not refreshed inside the loop below, so the targets would be identical on every step
+        self._apply_actions_as_ctrl_targets(delta_hand_pose, franka_gripper_width, do_scale=False)
 
         # Step sim
         for _ in range(sim_steps):
-            self._apply_actions_as_ctrl_targets(delta_hand_pose, franka_gripper_width, do_scale=False)
-            self.render()
+            if self._has_viewer:
+                self.render()
             self.gym.simulate(self.sim)
 
     def _check_lift_success(self, height_multiple):
         """Check if nut is above table by more than specified multiple times height of nut."""
 
         # success if both frankas lift the nut and bolt
-        lift_success = torch.where(
-            (self.nut_pos[:, 2] > self.cfg_base.env.table_height + self.nut_heights.squeeze(-1) * height_multiple) & 
-            (self.bolt_pos[:, 2] > self.cfg_base.env.table_height + self.bolt_head_heights.squeeze(-1) * height_multiple),
-            torch.ones((self.num_envs,), device=self.device),
-            torch.zeros((self.num_envs,), device=self.device))
-
+        lift_success = (
+            (self.nut_pos[:, 2] > self.cfg_base.env.table_height + self.nut_heights.squeeze(-1) * height_multiple) &
+            (self.bolt_pos[:, 2] > self.cfg_base.env.table_height + self.bolt_head_heights.squeeze(-1) * height_multiple)
+        ).to(self.rew_buf.dtype)
 
         return lift_success
 
@@ -499,108 +511,218 @@ class FactoryTaskNutBoltPick_MARL2(FactoryEnvNutBolt_MARL2, FactoryABCTask):
         """Move gripper to random pose."""
 
         # Set target pos above table
-        self.ctrl_target_fingertip_midpoint_pos = \
-            torch.tensor([0.0, 0.0, self.cfg_base.env.table_height], device=self.device) \
-            + torch.tensor(self.cfg_task.randomize.fingertip_midpoint_pos_initial, device=self.device)
-        self.ctrl_target_fingertip_midpoint_pos = self.ctrl_target_fingertip_midpoint_pos.unsqueeze(0).repeat(self.num_envs, 1)
-
-        self.second_ctrl_target_fingertip_midpoint_pos = \
-            torch.tensor([0.0, 0.0, self.cfg_base.env.table_height], device=self.device) \
-            + torch.tensor(self.cfg_task.randomize.fingertip_midpoint_pos_initial, device=self.device)
-        self.second_ctrl_target_fingertip_midpoint_pos = self.second_ctrl_target_fingertip_midpoint_pos.unsqueeze(0).repeat(self.num_envs, 1)
-
-        fingertip_midpoint_pos_noise = \
-            2 * (torch.rand((self.num_envs, 3), dtype=torch.float32, device=self.device) - 0.5)  # [-1, 1]
-        fingertip_midpoint_pos_noise = \
-            fingertip_midpoint_pos_noise @ torch.diag(torch.tensor(self.cfg_task.randomize.fingertip_midpoint_pos_noise,
-                                                                   device=self.device))
-        self.ctrl_target_fingertip_midpoint_pos += fingertip_midpoint_pos_noise
-
-        second_fingertip_midpoint_pos_noise = \
-            2 * (torch.rand((self.num_envs, 3), dtype=torch.float32, device=self.device) - 0.5)  # [-1, 1]
-        second_fingertip_midpoint_pos_noise = \
-            second_fingertip_midpoint_pos_noise @ torch.diag(torch.tensor(self.cfg_task.randomize.fingertip_midpoint_pos_noise,
-                                                                     device=self.device))
-        self.second_ctrl_target_fingertip_midpoint_pos += second_fingertip_midpoint_pos_noise
-
-        # Set target rot
-        ctrl_target_fingertip_midpoint_euler = torch.tensor(self.cfg_task.randomize.fingertip_midpoint_rot_initial,
-                                                            device=self.device).unsqueeze(0).repeat(self.num_envs, 1)
-        
-        second_ctrl_target_fingertip_midpoint_euler = torch.tensor(self.cfg_task.randomize.fingertip_midpoint_rot_initial,
-                                                            device=self.device).unsqueeze(0).repeat(self.num_envs, 1)
-
-        fingertip_midpoint_rot_noise = \
-            2 * (torch.rand((self.num_envs, 3), dtype=torch.float32, device=self.device) - 0.5)  # [-1, 1]
-        fingertip_midpoint_rot_noise = fingertip_midpoint_rot_noise @ torch.diag(
-            torch.tensor(self.cfg_task.randomize.fingertip_midpoint_rot_noise, device=self.device))
-        ctrl_target_fingertip_midpoint_euler += fingertip_midpoint_rot_noise
-        self.ctrl_target_fingertip_midpoint_quat = torch_utils.quat_from_euler_xyz(
-            ctrl_target_fingertip_midpoint_euler[:, 0],
-            ctrl_target_fingertip_midpoint_euler[:, 1],
-            ctrl_target_fingertip_midpoint_euler[:, 2])
-        
-        second_fingertip_midpoint_rot_noise = \
-            2 * (torch.rand((self.num_envs, 3), dtype=torch.float32, device=self.device) - 0.5)  # [-1, 1]
-        second_fingertip_midpoint_rot_noise = second_fingertip_midpoint_rot_noise @ torch.diag(
-            torch.tensor(self.cfg_task.randomize.fingertip_midpoint_rot_noise, device=self.device))
-        second_ctrl_target_fingertip_midpoint_euler += second_fingertip_midpoint_rot_noise
-        self.second_ctrl_target_fingertip_midpoint_quat = torch_utils.quat_from_euler_xyz(
-            second_ctrl_target_fingertip_midpoint_euler[:, 0],
-            second_ctrl_target_fingertip_midpoint_euler[:, 1],
-            second_ctrl_target_fingertip_midpoint_euler[:, 2])
-        
-
-        # Step sim and render
-        for _ in range(sim_steps):
-            self.refresh_base_tensors()
-            self.refresh_env_tensors()
-            self._refresh_task_tensors()
-
-            pos_error, axis_angle_error = fc.get_pose_error(
-                fingertip_midpoint_pos=self.fingertip_midpoint_pos,
-                fingertip_midpoint_quat=self.fingertip_midpoint_quat,
-                ctrl_target_fingertip_midpoint_pos=self.ctrl_target_fingertip_midpoint_pos,
-                ctrl_target_fingertip_midpoint_quat=self.ctrl_target_fingertip_midpoint_quat,
-                jacobian_type=self.cfg_ctrl['jacobian_type'],
-                rot_error_type='axis_angle')
-            
-            second_pos_error, second_axis_angle_error = fc.get_pose_error(
-                fingertip_midpoint_pos=self.second_fingertip_midpoint_pos,
-                fingertip_midpoint_quat=self.second_fingertip_midpoint_quat,
-                ctrl_target_fingertip_midpoint_pos=self.second_ctrl_target_fingertip_midpoint_pos,
-                ctrl_target_fingertip_midpoint_quat=self.second_ctrl_target_fingertip_midpoint_quat,
-                jacobian_type=self.cfg_ctrl['jacobian_type'],
-                rot_error_type='axis_angle')
-            
-
-            delta_hand_pose = torch.cat((pos_error, axis_angle_error), dim=-1)
-            actions = torch.zeros((self.num_envs, 12), device=self.device)
-            actions[:, :6] = delta_hand_pose
-
-
-            second_delta_hand_pose = torch.cat((second_pos_error, second_axis_angle_error), dim=-1)
-            second_actions = torch.zeros((self.num_envs, 12), device=self.device)
-            second_actions[:, :6] = second_delta_hand_pose
-
-            actions = torch.cat((actions, second_actions), dim=-1)
-
-            # print(actions[0])
-
-            self._apply_actions_as_ctrl_targets(actions=actions,
-                                                ctrl_target_gripper_dof_pos=self.asset_info_franka_table.franka_gripper_width_max,
-                                                do_scale=False)
-
-            self.gym.simulate(self.sim)
-            self.render()
-
-        self.dof_vel[env_ids, :] = torch.zeros_like(self.dof_vel[env_ids])
+        fingertip_midpoint_pos_noise = self._reset_noise_buf[:, 4:7]
+        self.ctrl_target_fingertip_midpoint_pos = self._fingertip_pos_init + fingertip_midpoint_pos_noise
+
+        second_fingertip_midpoint_pos_noise = self._reset_noise_buf[:, 7:10]
+        self.second_ctrl_target_fingertip_midpoint_pos = self._fingertip_pos_init + second_fingertip_midpoint_pos_noise
+
+        # Set target rot of both Frankas in one batch; shape of euler = (num_envs, 2, 3)
+        fingertip_midpoint_rot_noise = self._reset_noise_buf[:, 10:16].reshape(self.num_envs, 2, 3)
+        ctrl_target_fingertip_midpoint_euler = self._fingertip_rot_init + fingertip_midpoint_rot_noise
+        self.ctrl_target_fingertip_midpoint_quat, self.second_ctrl_target_fingertip_midpoint_quat = \
+            torch_utils.quat_from_euler_xyz(ctrl_target_fingertip_midpoint_euler[..., 0],
+                                            ctrl_target_fingertip_midpoint_euler[..., 1],
+                                            ctrl_target_fingertip_midpoint_euler[..., 2]).unbind(dim=1)
+
+        # The IK reset holds the solved pose with zero torques, so it is only used with manual (torque) control
+        reset_ik_num_iters = self.cfg_task.env.get('reset_ik_num_iters', 0)
+        if reset_ik_num_iters > 0 and self.cfg_ctrl['motor_ctrl_mode'] == 'manual':
+            self._solve_gripper_pose_ik(env_ids, num_iters=reset_ik_num_iters)
+        else:
+            self._servo_gripper_pose(sim_steps)
+
+        # The servo leaves small residual velocities, so zero them unconditionally (a no-op after the IK solve);
+        # checking first would need a device-to-host sync that costs more than the fill
+        self.dof_vel.index_fill_(0, env_ids, 0.0)
 
         # Set DOF state
-        multi_env_ids_int32 = self.franka_actor_ids_sim[env_ids].flatten()
-        second_multi_env_ids_int32 = self.second_franka_actor_ids_sim[env_ids].flatten()
-        multi_env_ids_int32 = torch.cat((multi_env_ids_int32, second_multi_env_ids_int32)).flatten()
+        multi_env_ids_int32 = self._gather_actor_ids(self._both_franka_actor_ids_sim, self._franka_ids_buf, env_ids)
         self.gym.set_dof_state_tensor_indexed(self.sim,
-                                              gymtorch.unwrap_tensor(self.dof_state),
+                                              self._dof_state_gym,
                                               gymtorch.unwrap_tensor(multi_env_ids_int32),
-                                              len(multi_env_ids_int32))
+                                              multi_env_ids_int32.numel())
+
+    def _servo_gripper_pose(self, sim_steps):
+        """Servo gripper to target pose with the task-space controller."""
+
+        # Servo targets of both Frankas, batched once (Franka 1 first, Franka 2 second); the randomized targets are
+        # fixed for the whole loop
+        ctrl_target_fingertip_midpoint_pos = torch.cat((self.ctrl_target_fingertip_midpoint_pos,
+                                                        self.second_ctrl_target_fingertip_midpoint_pos), dim=0)
+        ctrl_target_fingertip_midpoint_quat = torch.cat((self.ctrl_target_fingertip_midpoint_quat,
+                                                         self.second_ctrl_target_fingertip_midpoint_quat), dim=0)
+
+        # The small-angle error approximates the geometric error only; analytic Jacobians keep the full error
+        reset_small_angle_pose_error = self.cfg_task.env.get('reset_small_angle_pose_error', False) \
+            and self.cfg_ctrl['jacobian_type'] == 'geometric'
+
+        # Control-only servo loop; nothing here needs autograd tracking
+        with torch.no_grad():
+            for _ in range(sim_steps):
+                # Only the Franka state feeds the servo; nut/bolt and keypoint tensors are refreshed by the next
+                # post_physics_step before anything reads them
+                self.refresh_base_tensors()
+
+                # Pose error of both Frankas in one batch (Franka 1 first, Franka 2 second)
+                fingertip_midpoint_pos = torch.cat((self.fingertip_midpoint_pos,
+                                                    self.second_fingertip_midpoint_pos), dim=0)
+                fingertip_midpoint_quat = torch.cat((self.fingertip_midpoint_quat,
+                                                     self.second_fingertip_midpoint_quat), dim=0)
+                if reset_small_angle_pose_error:
+                    pos_error, axis_angle_error = compute_pose_error_small_angle(fingertip_midpoint_pos,
+                                                                                 fingertip_midpoint_quat,
+                                                                                 ctrl_target_fingertip_midpoint_pos,
+                                                                                 ctrl_target_fingertip_midpoint_quat)
+                else:
+                    pos_error, axis_angle_error = fc.get_pose_error(
+                        fingertip_midpoint_pos=fingertip_midpoint_pos,
+                        fingertip_midpoint_quat=fingertip_midpoint_quat,
+                        ctrl_target_fingertip_midpoint_pos=ctrl_target_fingertip_midpoint_pos,
+                        ctrl_target_fingertip_midpoint_quat=ctrl_target_fingertip_midpoint_quat,
+                        jacobian_type=self.cfg_ctrl['jacobian_type'],
+                        rot_error_type='axis_angle')
+
+                # (2 * num_envs, 3) -> (num_envs, 2, 3), written for both Frankas in one copy each
+                self._reset_actions_2b[..., 0:3] = pos_error.view(2, self.num_envs, 3).transpose(0, 1)
+                self._reset_actions_2b[..., 3:6] = axis_angle_error.view(2, self.num_envs, 3).transpose(0, 1)
+
+                self._apply_actions_as_ctrl_targets(actions=self._reset_actions,
+                                                    ctrl_target_gripper_dof_pos=self._gripper_width_max,
+                                                    do_scale=False)
+
+                self.gym.simulate(self.sim)
+                if self._has_viewer:
+                    self.render()
+
+    def _solve_gripper_pose_ik(self, env_ids, num_iters):
+        """Move gripper to target pose by closed-form damped-least-squares IK on the arm DOF positions."""
+
+        # Both Frankas stacked along the batch dim (Franka 1 first, Franka 2 second), as in _set_dof_torque
+        cfg_ctrl = dict(self.cfg_ctrl_batched, jacobian_type='geometric', ik_method='dls')
+        ctrl_target_fingertip_midpoint_pos = torch.cat((self.ctrl_target_fingertip_midpoint_pos,
+                                                        self.second_ctrl_target_fingertip_midpoint_pos), dim=0)
+        ctrl_target_fingertip_midpoint_quat = torch.cat((self.ctrl_target_fingertip_midpoint_quat,
+                                                         self.second_ctrl_target_fingertip_midpoint_quat), dim=0)
+        multi_env_ids_int32 = self._gather_actor_ids(self._both_franka_actor_ids_sim, self._franka_ids_buf, env_ids)
+
+        # Hold the arms with zero torques while stepping instead of the previous episode's actuation; Franka gravity
+        # is disabled, so zero torque holds the pose
+        self.dof_torque_full.index_fill_(0, env_ids, 0.0)
+        self.gym.set_dof_actuation_force_tensor_indexed(self.sim,
+                                                        gymtorch.unwrap_tensor(self.dof_torque_full),
+                                                        gymtorch.unwrap_tensor(multi_env_ids_int32),
+                                                        multi_env_ids_int32.numel())
+
+        with torch.no_grad():
+            for i in range(num_iters):
+                # The DOF state of the previous solve (or of _reset_franka on the first pass) has been set but not
+                # simulated yet; step once so that body poses and Jacobians reflect it
+                if i > 0:
+                    self.gym.set_dof_state_tensor_indexed(self.sim,
+                                                          self._dof_state_gym,
+                                                          gymtorch.unwrap_tensor(multi_env_ids_int32),
+                                                          multi_env_ids_int32.numel())
+                self.gym.simulate(self.sim)
+                if self._has_viewer:
+                    self.render()
+
+                self.refresh_base_tensors()
+
+                # One DLS step on the arm DOFs; gripper DOFs stay at their current positions
+                dof_pos_target = fc.compute_dof_pos_target(
+                    cfg_ctrl=cfg_ctrl,
+                    arm_dof_pos=torch.cat((self.dof_pos[:, 0:7], self.dof_pos[:, 9:16]), dim=0),
+                    fingertip_midpoint_pos=torch.cat((self.fingertip_midpoint_pos,
+                                                      self.second_fingertip_midpoint_pos), dim=0),
+                    fingertip_midpoint_quat=torch.cat((self.fingertip_midpoint_quat,
+                                                       self.second_fingertip_midpoint_quat), dim=0),
+                    jacobian=torch.cat((self.fingertip_midpoint_jacobian,
+                                        self.second_fingertip_midpoint_jacobian), dim=0),
+                    ctrl_target_fingertip_midpoint_pos=ctrl_target_fingertip_midpoint_pos,
+                    ctrl_target_fingertip_midpoint_quat=ctrl_target_fingertip_midpoint_quat,
+                    ctrl_target_gripper_dof_pos=torch.cat((self.dof_pos[:, 7:9], self.dof_pos[:, 16:18]), dim=0),
+                    device=self.device)
+
+                # (2 * num_envs, 9) -> (num_envs, 18) in sim DOF order; the last solve is set by the caller
+                self.dof_pos[env_ids] = torch.cat(dof_pos_target.chunk(2, dim=0), dim=1)[env_ids]
+                self.dof_vel.index_fill_(0, env_ids, 0.0)
+
+
+#####################################################################
+###=========================jit functions=========================###
+#####################################################################
+
+
+@torch.jit.script
+def transform_points(q, p, points_local):
+    # type: (Tensor, Tensor, Tensor) -> Tensor
+    """Map points (num_envs, num_points, 3) from a frame (num_envs, 4)/(num_envs, 3) into world frame."""
+
+    # Equivalent to tf_combine with identity local quats, minus the no-op quat multiply
+    q = q.unsqueeze(1).expand(-1, points_local.shape[1], -1)
+    return torch_utils.quat_apply(q, points_local) + p.unsqueeze(1)
+
+
+@torch.jit.script
+def compute_grasp_and_keypoints(obj_quat, obj_pos, obj_grasp_quat_local, obj_grasp_pos_local,
+                                fingertip_quat, fingertip_pos, keypoint_offsets):
+    # type: (Tensor, Tensor, Tensor, Tensor, Tensor, Tensor, Tensor) -> Tuple[Tensor, Tensor, Tensor, Tensor]
+    """Get object grasp pose and keypoints on gripper and object grasp frame in world frame."""
+
+    obj_grasp_quat, obj_grasp_pos = torch_jit_utils.tf_combine(obj_quat, obj_pos,
+                                                               obj_grasp_quat_local, obj_grasp_pos_local)
+    keypoints_gripper = transform_points(fingertip_quat, fingertip_pos, keypoint_offsets)
+    keypoints_obj = transform_points(obj_grasp_quat, obj_grasp_pos, keypoint_offsets)
+
+    return obj_grasp_quat, obj_grasp_pos, keypoints_gripper, keypoints_obj
+
+
+@torch.jit.script
+def compute_keypoint_reward(keypoints_obj, keypoints_gripper, actions, keypoint_reward_scale, action_penalty_scale):
+    # type: (Tensor, Tensor, Tensor, float, float) -> Tensor
+    """Get keypoint reward minus action penalty, summed over both Frankas.
+
+    Keypoints are (2 * num_envs, num_keypoints, 3), Franka 1 first; actions are (num_envs, 2 * num_actions_per_franka).
+    """
+
+    num_envs = actions.shape[0]
+    keypoint_dist = (keypoints_obj - keypoints_gripper).pow(2).sum(dim=-1).sqrt().sum(dim=-1)
+    keypoint_dist = keypoint_dist.view(2, num_envs).sum(dim=0)
+    action_penalty = actions.view(num_envs, 2, -1).pow(2).sum(dim=-1).sqrt().sum(dim=-1)
+
+    return -keypoint_dist * keypoint_reward_scale - action_penalty * action_penalty_scale
+
+
+@torch.jit.script
+def axis_angle_to_quat_clamped(rot_actions, identity_quat, clamp_rot, clamp_rot_thresh):
+    # type: (Tensor, Tensor, bool, float) -> Tensor
+    """Convert axis-angle actions to quats; optionally snap rotations below threshold to identity."""
+
+    angle = torch.norm(rot_actions, p=2, dim=-1)
+    # quat_from_angle_axis normalizes the axis with an eps-clamped norm, so the raw actions can be passed as the axis;
+    # a zero action then yields the identity quat instead of NaN
+    rot_actions_quat = torch_utils.quat_from_angle_axis(angle, rot_actions)
+    if clamp_rot:
+        rot_actions_quat = torch.where(angle.unsqueeze(-1) > clamp_rot_thresh,
+                                       rot_actions_quat,
+                                       identity_quat.expand_as(rot_actions_quat))
+
+    return rot_actions_quat
+
+
+@torch.jit.script
+def compute_pose_error_small_angle(fingertip_pos, fingertip_quat, target_pos, target_quat):
+    # type: (Tensor, Tensor, Tensor, Tensor) -> Tuple[Tensor, Tensor]
+    """Compute pose error with a first-order axis-angle of the difference quat; only valid for small rotations."""
+
+    pos_error = target_pos - fingertip_pos
+
+    # Fingertip quats are unit, so the conjugate is the inverse; same difference quat as fc.get_pose_error (geometric)
+    quat_error = torch_utils.quat_mul(target_quat, torch_utils.quat_conjugate(fingertip_quat))
+    # axis * angle ~= 2 * xyz for small angles; the sign of w picks the shorter rotation (w == 0 counts as positive,
+    # since torch.sign would zero the error there)
+    w_sign = 1.0 - 2.0 * (quat_error[:, 3:4] < 0.0).to(quat_error.dtype)
+    axis_angle_error = 2.0 * quat_error[:, 0:3] * w_sign
+
+    return pos_error, axis_angle_error